@@ -1,15 +1,62 @@
+"""
+Gardening weather advisor Lambda: a Strands agent that combines the user's plants
+(DynamoDB) with the Open-Meteo forecast to produce per-plant advice.
+
+DynamoDB reads are eventually consistent (ConsistentRead=False). Plant definitions
+and user locations change rarely and a read that lags a write by a second is
+harmless here, while eventually-consistent reads cost half the RCUs and can be
+served by any replica instead of waiting on the leader.
+"""
 import boto3
+import hashlib
 import logging
 import os
 import json
-import uuid
-from datetime import datetime, timezone
+import re
+import requests
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+from decimal import Decimal
+from urllib.parse import urlencode
 from boto3.dynamodb.conditions import Attr
+from botocore.config import Config
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from strands import Agent, tool
-from strands_tools import http_request
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+try:
+    from .response_utils import (
+        create_api_gateway_response,
+        create_direct_response,
+        extract_weather_conditions_from_response,
+        handle_ai_service_error,
+        handle_database_error,
+        json_loads,
+        new_request_id,
+        utc_timestamp,
+        validate_user_id,
+    )
+except ImportError:  # loaded as a top-level module (tests, scripts) rather than as src.agent
+    from response_utils import (
+        create_api_gateway_response,
+        create_direct_response,
+        extract_weather_conditions_from_response,
+        handle_ai_service_error,
+        handle_database_error,
+        json_loads,
+        new_request_id,
+        utc_timestamp,
+        validate_user_id,
+    )
 
 logger = logging.getLogger(__name__)
+# Accept any case (e.g. 'debug'); an unknown level falls back to INFO instead of failing the cold start
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').strip().upper()
+logger.setLevel(logging.getLevelNamesMapping().get(LOG_LEVEL, logging.INFO))
 
 # Get configuration from environment variables (set by CloudFormation)
 BEDROCK_REGION = os.environ.get('BEDROCK_REGION', 'eu-west-2')
@@ -17,15 +64,202 @@ USER_DATA_TABLE_NAME = os.environ.get('USER_DATA_TABLE_NAME', 'plant_database_us
 PLANT_DEFINITIONS_TABLE_NAME = os.environ.get('PLANT_DEFINITIONS_TABLE_NAME', 'garden_plants')
 USER_PROFILES_TABLE_NAME = os.environ.get('USER_PROFILES_TABLE_NAME', 'UserProfiles')
 
+# Keep the connection to DynamoDB alive between warm invocations so calls reuse
+# the TCP/TLS session established at cold start instead of reconnecting. The pool is
+# sized above urllib3's default of 10 so concurrent lookups never queue for a socket,
+# and short timeouts make a hung connection fail fast and retry instead of stalling
+# the invocation. Timeouts and the retry budget can be tuned per deployment.
+DYNAMODB_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=50,
+    connect_timeout=float(os.environ.get('DDB_CONNECT_TIMEOUT', '1.0')),
+    read_timeout=float(os.environ.get('DDB_READ_TIMEOUT', '3.0')),
+    retries={'max_attempts': int(os.environ.get('DDB_MAX_ATTEMPTS', '3')), 'mode': 'adaptive'},
+)
+
 # Initialize DynamoDB resource with region from environment
-dynamodb = boto3.resource('dynamodb', region_name=BEDROCK_REGION)
+dynamodb = boto3.resource('dynamodb', region_name=BEDROCK_REGION, config=DYNAMODB_CONFIG)
 
 # Initialize table references
 user_data_table = dynamodb.Table(USER_DATA_TABLE_NAME)
-plant_definitions_table = dynamodb.Table(PLANT_DEFINITIONS_TABLE_NAME)
 user_profiles_table = dynamodb.Table(USER_PROFILES_TABLE_NAME)
 
 
+def _warm_dynamodb_connection() -> None:
+    """
+    Open the DynamoDB connection during the Lambda init phase so the first request
+    does not pay the TCP/TLS handshake. Failures are ignored; the real call will retry.
+    """
+    try:
+        user_data_table.get_item(Key={'user_id': '__warmup__'})
+    except Exception as e:
+        logger.debug("DynamoDB warm-up call failed: %s", e)
+
+
+# Only warm inside Lambda; local runs and tests have no DynamoDB endpoint to reach
+if os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+    _warm_dynamodb_connection()
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_MAX_RETRIES = 5
+
+# More parallel DynamoDB calls than this contend in the SDK and raise tail latency
+# instead of lowering it; the cap applies across all threads (tools, chunks, prefetch).
+# At least one slot, or every DynamoDB call would block forever
+DDB_MAX_CONCURRENCY = max(1, int(os.environ.get('DDB_MAX_CONCURRENCY', '4')))
+_ddb_slots = threading.BoundedSemaphore(DDB_MAX_CONCURRENCY)
+
+# Plant attributes the advice workflow uses; everything else (scientific name, soil/pH
+# preferences, ...) is left out of the read to keep items small.
+PLANT_ADVICE_ATTRIBUTES = (
+    'plant_id', 'common_name',
+    'min_temp_c', 'max_temp_c', 'ideal_temp_range_c', 'frost_tolerance',
+    'sunlight_requirement', 'min_daily_sunlight_hours', 'max_daily_sunlight_hours',
+    'watering_frequency_days', 'soil_moisture_preference', 'rainfall_tolerance_mm_per_day',
+    'ideal_humidity_range_percent', 'humidity_tolerance',
+    'wind_tolerance_kmph', 'requires_staking', 'shelter_requirement',
+    'growing_season', 'dormant_season',
+    'last_frost_date_safe_planting', 'first_frost_date_end_of_growth',
+    'special_weather_notes', 'common_weather_risks', 'protection_methods', 'growth_stage',
+)
+# Placeholders keep the projection safe from DynamoDB reserved words
+PLANT_PROJECTION = {
+    'ProjectionExpression': ', '.join(f'#a{i}' for i in range(len(PLANT_ADVICE_ATTRIBUTES))),
+    'ExpressionAttributeNames': {f'#a{i}': name for i, name in enumerate(PLANT_ADVICE_ATTRIBUTES)},
+}
+
+# Open-Meteo forecast endpoint and the weather variables the advice is based on
+OPEN_METEO_URL = 'https://api.open-meteo.com/v1/forecast'
+OPEN_METEO_PARAMS = {
+    'current': 'temperature_2m,wind_speed_10m,relative_humidity_2m,weather_code',
+    'hourly': 'temperature_2m,relative_humidity_2m,wind_speed_10m,precipitation,temperature_80m',
+}
+# (connect, read): an unreachable host fails fast, a slow forecast still gets time to arrive
+OPEN_METEO_TIMEOUT_SECONDS = (3.0, 10.0)
+# The constant part of the query string is encoded once, at import
+OPEN_METEO_BASE_URL = f"{OPEN_METEO_URL}?{urlencode(OPEN_METEO_PARAMS, safe=',')}"
+# Transient connection failures and 5xx responses are retried with a short backoff
+OPEN_METEO_RETRY = Retry(total=3, backoff_factor=0.2, status_forcelist=(500, 502, 503, 504))
+
+# Forecasts change hourly, so co-located repeat requests reuse a recent response
+WEATHER_CACHE_MAX_SIZE = 256
+WEATHER_CACHE_TTL_SECONDS = int(os.environ.get('WEATHER_CACHE_TTL_SECONDS', '600'))
+
+# A user's location and plant list rarely change within a minute
+USER_CACHE_MAX_SIZE = 256
+USER_CACHE_TTL_SECONDS = 60
+
+# Plant IDs seen for a user, used to read their definitions in the same request as the user item
+USER_PLANT_IDS_TTL_SECONDS = 86400
+
+# Advice is a function of the user's plants and the forecast, so a repeat request
+# within the window is answered without invoking the model
+RESPONSE_CACHE_MAX_SIZE = 256
+RESPONSE_CACHE_TTL_SECONDS = int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '600'))
+
+# Plant definitions are read-mostly reference data, so warm containers keep them in memory
+PLANT_CACHE_MAX_SIZE = 2048
+PLANT_CACHE_TTL_SECONDS = int(os.environ.get('PLANT_CACHE_TTL_SECONDS', '3600'))
+
+
+class _TTLCache:
+    """
+    Small in-process LRU cache whose entries expire after ``ttl`` seconds.
+    Guarded by a lock: tools run on worker threads (batched and composite lookups).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_plant_cache = _TTLCache(PLANT_CACHE_MAX_SIZE, PLANT_CACHE_TTL_SECONDS)
+_user_cache = _TTLCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+_user_plant_ids = _TTLCache(USER_CACHE_MAX_SIZE, USER_PLANT_IDS_TTL_SECONDS)
+_response_cache = _TTLCache(RESPONSE_CACHE_MAX_SIZE, RESPONSE_CACHE_TTL_SECONDS)
+
+# 'current' weather seen by the weather tools during the running invocation. A container
+# serves one invocation at a time, so module scope is request scope; the handler resets it.
+_request_weather: Dict[str, Any] = {}
+_weather_cache = _TTLCache(WEATHER_CACHE_MAX_SIZE, WEATHER_CACHE_TTL_SECONDS)
+
+# Lookups currently running, by key. A tool call that overlaps the background prefetch of the
+# same data waits for that fetch instead of repeating the DynamoDB or Open-Meteo round trip.
+_inflight: Dict[Any, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _single_flight(key, fetch):
+    """
+    Run fetch() once per key at a time; concurrent callers with the same key wait for the
+    running call and share its result or exception. fetch should fill the matching cache,
+    so callers arriving after it finishes are answered from there.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = _inflight[key] = Future()
+    if not is_owner:
+        return future.result()
+
+    try:
+        result = fetch()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+# Shared HTTP session so warm containers reuse the TCP/TLS connection to Open-Meteo
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=OPEN_METEO_RETRY))
+
+
+def _to_native(value: Any) -> Any:
+    """
+    Recursively convert DynamoDB values to plain JSON types: Decimal becomes int or float
+    and sets become lists. Done once per item so later serialisation needs no fallbacks.
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    if isinstance(value, dict):
+        return {k: _to_native(v) for k, v in value.items()}
+    if isinstance(value, (list, set)):
+        return [_to_native(v) for v in value]
+    return value
+
+
 class AuthError(Exception):
     """Raised when authentication/authorization fails."""
     def __init__(self, status_code: int, error_code: str, message: str):
@@ -109,6 +343,38 @@ def _safe_sub(event: dict) -> str:
         return "unknown"
 
 
+def _get_user_item(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Read a user's item. When the user's plant IDs are known from an earlier request, their
+    uncached plant definitions are read in the same BatchGetItem and put in the plant cache,
+    so the plant lookup that follows needs no second round trip.
+    """
+    known_plant_ids = _user_plant_ids.get(user_id) or []
+    # BatchGetItem rejects duplicate keys, so repeated plant IDs are read once
+    prefetch = [p for p in dict.fromkeys(known_plant_ids) if _plant_cache.get(p) is None][:BATCH_GET_MAX_KEYS - 1]
+    if not prefetch:
+        with _ddb_slots:
+            response = user_data_table.get_item( # Using user_data_table here
+                Key={'user_id': user_id}, # Assuming 'user_id' is the primary key for user items
+                ConsistentRead=False,
+            )
+        return response.get('Item')
+
+    responses = _batch_get({
+        USER_DATA_TABLE_NAME: {'Keys': [{'user_id': user_id}], 'ConsistentRead': False},
+        PLANT_DEFINITIONS_TABLE_NAME: {
+            'Keys': [{'plant_id': p} for p in prefetch],
+            'ConsistentRead': False,
+            **PLANT_PROJECTION,
+        },
+    })
+    for item in responses.get(PLANT_DEFINITIONS_TABLE_NAME, []):
+        plant = _to_native(item)
+        _plant_cache.put(plant['plant_id'], plant)
+    user_items = responses.get(USER_DATA_TABLE_NAME)
+    return user_items[0] if user_items else None
+
+
 @tool
 def dynamodb_lookup_user_data(user_id: str) -> Dict[str, Any]:
     """
@@ -122,14 +388,15 @@ def dynamodb_lookup_user_data(user_id: str) -> Dict[str, Any]:
         Dict[str, Any]: A dictionary containing 'latitude', 'longitude', and 'plants' (list of plant_ids)
                         on success, or an 'error' message if the user or location is not found.
     """
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
     try:
-        response = user_data_table.get_item( # Using user_data_table here
-            Key={'user_id': user_id} # Assuming 'user_id' is the primary key for user items
-        )
-        item = response.get('Item')
+        item = _get_user_item(user_id)
 
         if not item:
-            print(f"DynamoDB Tool: No user item found for user_id '{user_id}'.")
+            logger.debug("DynamoDB Tool: No user item found for user_id '%s'", user_id)
             # Raise a specific exception that can be caught by error handlers
             raise ValueError(f"No user data found for user ID '{user_id}'. Please ensure it's registered.")
 
@@ -138,369 +405,486 @@ def dynamodb_lookup_user_data(user_id: str) -> Dict[str, Any]:
         plants = item.get('plants', []) # Get the list of plant IDs, default to empty list if not present
 
         if latitude is None or longitude is None:
-            print(f"DynamoDB Tool: Latitude or longitude missing for user_id '{user_id}'. Item: {item}")
+            logger.debug("DynamoDB Tool: Latitude or longitude missing for user_id '%s'", user_id)
             return {'error': f"Location data is incomplete for user ID '{user_id}'."}
 
-        print(f"DynamoDB Tool: Found user data for '{user_id}': lat={latitude}, lon={longitude}, plants={plants}")
-        return {'latitude': float(latitude), 'longitude': float(longitude), 'plants': plants}
+        logger.debug("DynamoDB Tool: Found user data for '%s': %d plants", user_id, len(plants))
+        user_data = {'latitude': float(latitude), 'longitude': float(longitude), 'plants': _to_native(plants)}
+        _user_cache.put(user_id, user_data)
+        _user_plant_ids.put(user_id, user_data['plants'])
+        return user_data
 
     except ValueError:
         # Re-raise ValueError (user not found) to be handled by main error handler
         raise
     except Exception as e:
-        print(f"DynamoDB Tool Error (User Data): {e}")
+        logger.error("DynamoDB Tool Error (User Data): %s", e)
         # For other database errors, raise with more context
         raise Exception(f"DynamoDB error while fetching user data for '{user_id}': {str(e)}")
 
+
+def _batch_get(request_items: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Run one BatchGetItem request (up to BATCH_GET_MAX_KEYS keys, across any tables) and
+    return the items per table. UnprocessedKeys are retried with exponential backoff.
+    """
+    items: Dict[str, List[Dict[str, Any]]] = {}
+    attempt = 0
+    while request_items:
+        with _ddb_slots:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+        for table_name, table_items in response.get('Responses', {}).items():
+            items.setdefault(table_name, []).extend(table_items)
+        request_items = response.get('UnprocessedKeys') or {}
+        if request_items:
+            attempt += 1
+            if attempt > BATCH_GET_MAX_RETRIES:
+                raise Exception(f"BatchGetItem left unprocessed keys after {BATCH_GET_MAX_RETRIES} retries")
+            time.sleep(0.05 * (2 ** attempt))
+    return items
+
+
+def _fetch_plant_batch(plant_ids: List[str]) -> List[Dict[str, Any]]:
+    """Fetch up to BATCH_GET_MAX_KEYS plant items with one BatchGetItem request."""
+    request_items = {
+        PLANT_DEFINITIONS_TABLE_NAME: {
+            'Keys': [{'plant_id': p} for p in plant_ids],
+            'ConsistentRead': False,
+            **PLANT_PROJECTION,
+        }
+    }
+    return _batch_get(request_items).get(PLANT_DEFINITIONS_TABLE_NAME, [])
+
+
+def _batch_get_plant_items(plant_ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    Fetch plant items with BatchGetItem, chunked to BATCH_GET_MAX_KEYS keys per request.
+    Multiple chunks are fetched concurrently; the DynamoDB client is thread-safe and its
+    connection pool (max_pool_connections) is sized for it.
+    """
+    batches = [plant_ids[i:i + BATCH_GET_MAX_KEYS] for i in range(0, len(plant_ids), BATCH_GET_MAX_KEYS)]
+    if len(batches) == 1:
+        return _fetch_plant_batch(batches[0])
+
+    with ThreadPoolExecutor(max_workers=min(len(batches), DDB_MAX_CONCURRENCY)) as executor:
+        return [item for items in executor.map(_fetch_plant_batch, batches) for item in items]
+
+
+def _fetch_and_cache_plants(plant_ids: List[str]) -> List[Dict[str, Any]]:
+    """Read the given plants (skipping any cached since the caller looked) and put them in the plant cache."""
+    items = []
+    misses = []
+    for plant_id in plant_ids:
+        cached = _plant_cache.get(plant_id)
+        if cached is None:
+            misses.append(plant_id)
+        else:
+            items.append(cached)
+
+    for item in _batch_get_plant_items(misses) if misses else []:
+        plant = _to_native(item)
+        _plant_cache.put(plant['plant_id'], plant)
+        items.append(plant)
+    return items
+
+
 @tool
-def dynamodb_lookup_plant_data(plant_id: str) -> Dict[str, Any]:
+def dynamodb_lookup_plants_batch(plant_ids: List[str]) -> Dict[str, Any]:
     """
-    Looks up detailed information for a single plant from the **plant definitions DynamoDB table**.
-    This function is designed to be called by the LLM as a tool.
+    Looks up detailed information for several plants at once from the **plant definitions DynamoDB table**.
+    This function is designed to be called by the LLM as a tool, once, with the full plant list;
+    never call a tool per plant.
 
     Args:
-        plant_id (str): The ID of the plant to fetch.
+        plant_ids (List[str]): The IDs of the plants to fetch.
 
     Returns:
-        Dict[str, Any]: A dictionary containing all attributes for the plant on success,
-                        or an 'error' message if the plant is not found.
+        Dict[str, Any]: A dictionary with 'plants' (list of plant attribute dictionaries, in the order
+                        the IDs were given) and 'not_found' (plant IDs with no definition; mention
+                        them but advise on the rest), or an 'error' message on failure.
     """
+    # BatchGetItem rejects duplicate keys within a request
+    unique_ids = list(dict.fromkeys(plant_ids))
+
+    by_id = {}
+    misses = []
+    for plant_id in unique_ids:
+        cached = _plant_cache.get(plant_id)
+        if cached is None:
+            misses.append(plant_id)
+        else:
+            by_id[plant_id] = cached
+
     try:
-        print(f"DynamoDB Tool: Attempting to fetch plant data for plant_id: {plant_id} from {PLANT_DEFINITIONS_TABLE_NAME}")
-        response = plant_definitions_table.get_item( 
-            Key={'plant_id': plant_id} 
-        )
-        print(f"DynamoDB Tool: Plant data query executed. Response: {response}")
-        item = response.get('Item')
-        print(f"DynamoDB Tool: Plant data result: {item}")
+        fetched = _single_flight(('plants', frozenset(misses)), partial(_fetch_and_cache_plants, misses)) if misses else []
+    except Exception as e:
+        logger.error("DynamoDB Tool Error (Plant Batch): %s", e)
+        return {'error': f"A database error occurred while fetching plant data for {unique_ids}: {str(e)}"}
 
-        if not item:
-            print(f"DynamoDB Tool: No plant item found for plant_id '{plant_id}'.")
-            return {'error': f"No plant data found for plant ID '{plant_id}'."}
+    for item in fetched:
+        by_id[item['plant_id']] = item
 
-        print(f"DynamoDB Tool: Found plant data for '{plant_id}': {item.get('common_name', 'N/A')}")
-        return item # Return the full item with all plant attributes
+    # BatchGetItem returns items in no particular order; report them in request order
+    plants = [by_id[p] for p in unique_ids if p in by_id]
+    not_found = [p for p in unique_ids if p not in by_id]
+    logger.debug("DynamoDB Tool: Fetched %d plants from DynamoDB, %d from cache", len(fetched), len(plants) - len(fetched))
+    return {'plants': plants, 'not_found': not_found}
 
-    except Exception as e:
-        print(f"DynamoDB Tool Error (Plant Data): {e}")
-        return {'error': f"A database error occurred while fetching plant data for '{plant_id}': {str(e)}"}
-
-
-WEATHER_SYSTEM_PROMPT = """You are a highly knowledgeable **Gardening Weather Advisor** with HTTP and database lookup capabilities. Your goal is to provide **tailored weather-related advice for a user's specific plants** based on current and forecast weather conditions.
-
-**Here's your comprehensive workflow:**
-
-1.  **Understand User's Request:**
-    * If the user provides a `user_id` (e.g., "Give me plant advice for user_id testuser1"), you MUST immediately use the `dynamodb_lookup_user_data` tool to get their registered `latitude`, `longitude`, and their `plants` list (a list of plant IDs). This is your first and mandatory step.
-    * If the user directly provides `latitude` and `longitude` AND a list of specific plant IDs (e.g., "What advice for plant_id 'rose_1', 'sunflower_2' at lat 52.52, lon 13.41?"), skip the initial user data lookup and proceed to step 2 with the provided coordinates and plant IDs.
-
-2.  **Fetch User Data and Plant IDs (if `user_id` provided):**
-    * Use the `dynamodb_lookup_user_data` tool, passing the `user_id` as the argument.
-    * **Example tool call:** `dynamodb_lookup_user_data(user_id='testuser1')`
-    * Carefully process the output of this tool. If it contains an 'error' key, inform the user about the error and terminate.
-    * If the user has no plants registered (the `plants` list is empty), inform them and terminate.
-
-3.  **Fetch Detailed Plant Information:**
-    * For each `plant_id` obtained from the user data (or provided directly), you must use the `dynamodb_lookup_plant_data` tool to get its specific requirements.
-    * **Crucial:** You must call `dynamodb_lookup_plant_data` for *each individual plant ID* in the list. Collect all the detailed plant dictionaries.
-    * **Example tool call (for each plant):** `dynamodb_lookup_plant_data(plant_id='rose_1')`
-    * If any plant lookup fails (returns an 'error' key), note it but continue fetching other plants.
-
-4.  **Retrieve Current and Hourly Weather Data:**
-    * Once you have the latitude and longitude (from user data or direct input), use the `http_request` tool to get weather from the **Open-Meteo API**.
-    * The API endpoint is: `https://api.open-meteo.com/v1/forecast`
-    * Make an HTTP GET request with the following query parameters:
-        * `latitude={latitude}`
-        * `longitude={longitude}`
-        * `current=temperature_2m,wind_speed_10m,relative_humidity_2m`
-        * `hourly=temperature_2m,relative_humidity_2m,wind_speed_10m,precipitation,temperature_80m`
-    * **Example tool call:** `http_request(method='GET', url='https://api.open-meteo.com/v1/forecast?latitude=XX.XX&longitude=YY.YY&current=temperature_2m,wind_speed_10m,relative_humidity_2m&hourly=temperature_2m,relative_humidity_2m,wind_speed_10m,precipitation,temperature_80m')`
-    * Process the weather API's JSON response.
-
-5.  **Generate Tailored Weather Advice for Each Plant:**
-    * For *each plant* you have detailed information for, compare the **current weather** and **hourly forecast** against the plant's specific requirements (min/max temp, ideal temp range, frost tolerance, sunlight, watering frequency, soil moisture, rainfall tolerance, humidity, wind tolerance, special notes, common risks, protection methods, growing/dormant season, frost dates).
-    * **Only provide advice or mention conditions that require attention, mitigation, or action.** Do not explicitly state when conditions are ideal or "no action is needed" unless specifically asked or if it's highly noteworthy.
-    * **Structure your advice clearly, addressing each plant individually.** Use bullet points for easy readability if a plant has multiple points of advice.
-    * **Focus on actionable advice:**
-        * Is the current/forecasted temperature too hot/cold? Suggest shelter, frost protection.
-        * Is humidity ideal, too high, or too low? Advise misting or improving air circulation.
-        * Is wind speed too high? Suggest staking or moving to a sheltered spot.
-        * Is there expected precipitation? Advise on watering needs (or lack thereof).
-        * Check sunlight hours against requirements.
-        * Consider `growing_season`, `dormant_season`, and frost dates for planting/protection advice.
-        * Mention any `common_weather_risks` that apply based on current/forecasted weather.
-        * Refer to `protection_methods` if a risk is identified.
-    * If a plant's conditions are *perfectly* within its ideal ranges for all factors and no risks are present, you can simply state, "Conditions are currently ideal for your [Plant Common Name]." but avoid listing every single perfect metric.
-
-**Response Format Requirements:**
-You must structure your response as a JSON object with exactly two attributes:
-```json
-{
-    "details": {
-        // Detailed advice for each plant, organized by plant name
-        "Plant Name 1": "Specific advice for this plant...",
-        "Plant Name 2": "Specific advice for this plant..."
-    },
-    "summary": "A concise summary of the overall advice and current conditions."
-}
-```
-
-**Guidelines for the response format:**
-- The "details" object should contain entries for each plant, with the plant's common name as the key and detailed advice as the value.
-- For each plant, provide clear, concise, actionable advice focusing on conditions that require action or highlight potential issues.
-- The "summary" should be a brief overview that captures the most important points from the detailed advice.
-- Handle all errors gracefully within this JSON structure.
-- Maintain a helpful and knowledgeable tone throughout.
-"""
 
+@tool
+def dynamodb_lookup_user_and_plants(user_id: str) -> Dict[str, Any]:
+    """
+    Looks up a user's latitude and longitude together with the details of every plant they grow.
+    Call this once, first, for a user_id; then call fetch_weather with the returned coordinates.
+    If 'plants' is empty, tell the user they have no plants registered and stop.
 
-def is_api_gateway_event(event: Dict[str, Any]) -> bool:
+    Args:
+        user_id (str): The ID of the user whose location and plants are to be fetched.
+
+    Returns:
+        Dict[str, Any]: A dictionary containing 'latitude', 'longitude', 'plants' (list of plant
+                        attribute dictionaries: temperature range, frost tolerance, sunlight, watering,
+                        rainfall, humidity, wind tolerance, seasons, frost dates, risks and protection
+                        methods to compare with the forecast) and 'not_found' (plant IDs with no
+                        definition; mention them but advise on the rest) on success, or an 'error'
+                        message if the lookup fails.
     """
-    Detect if the event is from API Gateway by checking for API Gateway-specific fields.
+    user_data = dynamodb_lookup_user_data(user_id)
+    if 'error' in user_data:
+        return user_data
+
+    plant_data = dynamodb_lookup_plants_batch(user_data['plants'])
+    if 'error' in plant_data:
+        return plant_data
+
+    return {'latitude': user_data['latitude'], 'longitude': user_data['longitude'], **plant_data}
+
+
+def _get_open_meteo(latitude: str, longitude: str) -> Any:
+    """GET the Open-Meteo forecast for the given (comma-separated) coordinates and return the parsed JSON."""
+    url = f"{OPEN_METEO_BASE_URL}&{urlencode({'latitude': latitude, 'longitude': longitude}, safe=',')}"
+    response = http_session.get(url, timeout=OPEN_METEO_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return response.json()
+
+
+def _weather_condition(code: Optional[int]) -> Optional[str]:
+    """Map a WMO weather code (Open-Meteo 'weather_code') to the condition shown in the frontend."""
+    if code is None:
+        return None
+    if code == 0:
+        return "clear"
+    if code in (1, 2):
+        return "partly cloudy"
+    if code == 3:
+        return "overcast"
+    if code in (45, 48):
+        return "fog"
+    if 71 <= code <= 77 or code in (85, 86):
+        return "snow"
+    if code >= 95:
+        return "storm"
+    if 51 <= code <= 82:
+        return "rainy"
+    return None
+
+
+def weather_conditions_from_forecast(forecast: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Build the response's weather_conditions from an Open-Meteo forecast's 'current' block."""
+    current = forecast.get('current') if isinstance(forecast, dict) else None
+    if not current:
+        return None
+    conditions = {
+        "temperature": current.get('temperature_2m'),
+        "humidity": current.get('relative_humidity_2m'),
+        "wind_speed": current.get('wind_speed_10m'),
+        "condition": _weather_condition(current.get('weather_code')),
+    }
+    conditions = {key: value for key, value in conditions.items() if value is not None}
+    return conditions or None
+
+
+def _record_request_weather(forecast: Dict[str, Any]) -> None:
+    """Keep the first location's current weather for the response."""
+    if not _request_weather:
+        _request_weather.update(weather_conditions_from_forecast(forecast) or {})
+
+
+def _fetch_and_cache_forecast(cache_key: tuple, latitude: float, longitude: float) -> Any:
+    """Fetch the forecast for a location unless it was cached since the caller looked, and cache it."""
+    forecast = _weather_cache.get(cache_key)
+    if forecast is None:
+        forecast = _get_open_meteo(str(latitude), str(longitude))
+        _weather_cache.put(cache_key, forecast)
+    return forecast
+
+
+@tool
+def fetch_weather(latitude: float, longitude: float) -> Dict[str, Any]:
     """
-    return (
-        'httpMethod' in event and 
-        'path' in event and 
-        'headers' in event and
-        'body' in event
-    )
+    Fetches current and hourly weather for a location from the Open-Meteo API.
+    This function is designed to be called by the LLM as a tool.
 
+    Args:
+        latitude (float): Latitude of the location.
+        longitude (float): Longitude of the location.
 
-def parse_api_gateway_request(event: Dict[str, Any]) -> Dict[str, Any]:
+    Returns:
+        Dict[str, Any]: The Open-Meteo forecast with 'current' (temperature, wind speed, humidity)
+                        and 'hourly' (temperature, humidity, wind speed, precipitation) data,
+                        or an 'error' message if the weather service call fails.
     """
-    Parse API Gateway proxy event to extract request data.
+    # ~1km grid per cache entry; the short TTL keeps 'current' current
+    cache_key = (round(latitude, 2), round(longitude, 2))
+    forecast = _weather_cache.get(cache_key)
+    if forecast is None:
+        try:
+            forecast = _single_flight(
+                ('weather', cache_key), partial(_fetch_and_cache_forecast, cache_key, latitude, longitude)
+            )
+        except Exception as e:
+            logger.error("Weather Tool Error: %s", e)
+            return {'error': f"Weather service request failed for ({latitude}, {longitude}): {str(e)}"}
+
+    _record_request_weather(forecast)
+    return forecast
+
+
+@tool
+def fetch_weather_batch(coordinates: List[List[float]]) -> Dict[str, Any]:
+    """
+    Fetches current and hourly weather for several locations with a single Open-Meteo request.
+    This function is designed to be called by the LLM as a tool whenever more than one location is involved.
+
+    Args:
+        coordinates (List[List[float]]): The locations as [latitude, longitude] pairs.
+
+    Returns:
+        Dict[str, Any]: A dictionary with 'forecasts', one Open-Meteo forecast per location in input
+                        order, or an 'error' message if the weather service call fails.
     """
     try:
-        # Parse the body if it exists and is a string
-        body = event.get('body')
-        if body and isinstance(body, str):
-            request_data = json.loads(body)
-        elif body and isinstance(body, dict):
-            request_data = body
-        else:
-            request_data = {}
-        
-        # Extract headers (case-insensitive)
-        headers = event.get('headers', {})
-        
-        # Extract query parameters
-        query_params = event.get('queryStringParameters') or {}
-        
-        return {
-            'request_data': request_data,
-            'headers': headers,
-            'query_params': query_params,
-            'http_method': event.get('httpMethod'),
-            'path': event.get('path')
-        }
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Invalid JSON in request body: {str(e)}")
+        data = _get_open_meteo(
+            ','.join(str(lat) for lat, _ in coordinates),
+            ','.join(str(lon) for _, lon in coordinates),
+        )
+    except Exception as e:
+        logger.error("Weather Tool Error (Batch): %s", e)
+        return {'error': f"Weather service request failed for {len(coordinates)} locations: {str(e)}"}
 
+    # Open-Meteo answers a single location with an object and several with a list
+    forecasts = data if isinstance(data, list) else [data]
+    if forecasts:
+        _record_request_weather(forecasts[0])
+    return {'forecasts': forecasts}
 
-def create_api_gateway_response(
-    status_code: int, 
-    body: Dict[str, Any] = None, 
-    error_message: str = None,
-    error_code: str = None,
-    user_id: str = None,
-    weather_conditions: Dict[str, Any] = None,
-    request_id: str = None
-) -> Dict[str, Any]:
+
+@tool
+def fetch_weather_and_plants(latitude: float, longitude: float, plant_ids: List[str]) -> Dict[str, Any]:
     """
-    Create a properly formatted API Gateway response with CORS headers.
-    Enhanced to include user_id, timestamp, weather conditions, and request tracking.
+    Fetches the weather for a location and the details of the given plants in one call.
+    This function is designed to be called by the LLM as a tool, once, when coordinates and plant IDs
+    are both given. For several locations use dynamodb_lookup_plants_batch and fetch_weather_batch instead.
+
+    Args:
+        latitude (float): Latitude of the location.
+        longitude (float): Longitude of the location.
+        plant_ids (List[str]): The IDs of the plants to fetch.
+
+    Returns:
+        Dict[str, Any]: A dictionary with 'weather' (the Open-Meteo forecast), 'plants' and 'not_found'
+                        as returned by dynamodb_lookup_plants_batch, or an 'error' message on failure.
     """
-    timestamp = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
-    
-    if error_message:
-        # Error response format
-        response_body = {
-            "statusCode": status_code,
-            "error": error_code or get_error_type_from_status(status_code),
-            "message": error_message,
-            "request_id": request_id or str(uuid.uuid4()),
-            "timestamp": timestamp
-        }
-        if user_id:
-            response_body["user_id"] = user_id
-    else:
-        # Success response format
-        response_body = {
-            "statusCode": status_code,
-            "advice": body.get("summary", "") if body else "",
-            "details": body.get("details", {}) if body else {},
-            "timestamp": timestamp
-        }
-        if user_id:
-            response_body["user_id"] = user_id
-        if weather_conditions:
-            response_body["weather_conditions"] = weather_conditions
-    
-    return {
-        "statusCode": status_code,
-        "headers": {
-            "Content-Type": "application/json",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
-            "Access-Control-Allow-Methods": "POST,OPTIONS"
-        },
-        "body": json.dumps(response_body)
-    }
+    # Neither lookup depends on the other, so the weather round trip overlaps the DynamoDB one
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        weather_future = executor.submit(fetch_weather, latitude, longitude)
+        plants_future = executor.submit(dynamodb_lookup_plants_batch, plant_ids)
+        weather, plant_data = weather_future.result(), plants_future.result()
+
+    if 'error' in plant_data:
+        return plant_data
+    if 'error' in weather:
+        return weather
+    return {'weather': weather, **plant_data}
+
+
+_PROMPT_ADVICE = """Then advise on each plant only where the weather needs action (shelter, frost protection, staking, watering, airflow); if none, say conditions are ideal for it. If a tool returns 'error', report it and stop.
+Respond with JSON only: {"details": {"<plant common name>": "advice"}, "summary": "brief overview"}
+"""
+
+# Each request path gets a prompt that only describes its own task; how and when to
+# call each tool is in the tool descriptions, which the model receives with the tools
+USER_ID_SYSTEM_PROMPT = "You are a Gardening Weather Advisor. Look up the user's garden and its weather. " + _PROMPT_ADVICE
+
+DIRECT_SYSTEM_PROMPT = "You are a Gardening Weather Advisor. Fetch the given plants and the weather at the given coordinates. " + _PROMPT_ADVICE
+
+# Prompts that give coordinates directly ("at lat 52.52, lon 13.41") take the direct path
+DIRECT_PROMPT_PATTERN = re.compile(r'\blat(?:itude)?\b', re.IGNORECASE)
+
+
+# Built once per container: warm invocations reuse the parsed tool specs and model client
+plant_weather_agent = Agent(
+    system_prompt=USER_ID_SYSTEM_PROMPT,
+    tools=[fetch_weather, dynamodb_lookup_user_and_plants],
+    model="amazon.nova-lite-v1:0",
+    region=BEDROCK_REGION,
+)
+
+direct_weather_agent = Agent(
+    system_prompt=DIRECT_SYSTEM_PROMPT,
+    tools=[fetch_weather_and_plants, fetch_weather_batch, dynamodb_lookup_plants_batch],
+    model="amazon.nova-lite-v1:0",
+    region=BEDROCK_REGION,
+)
 
 
-def get_error_type_from_status(status_code: int) -> str:
+USER_PROMPT_TEMPLATE = "Give me plant advice for user_id {user_id}"
+
+# "Give me plant advice for user_id testuser1" → "testuser1"
+USER_ID_PROMPT_PATTERN = re.compile(r'\buser_id\s+([A-Za-z0-9_-]+)')
+
+
+# Runs the user's plant and weather lookups while the model plans its first tool call
+_prefetch_executor = ThreadPoolExecutor(max_workers=2)
+
+
+def prefetch_user_inputs(user_id: str) -> List[Future]:
     """
-    Map HTTP status codes to error types for consistent error responses.
+    Start the plant and weather lookups for a prechecked user in the background. The model
+    takes a full turn before its first tool call, so the tools usually answer from the caches;
+    a tool call that overlaps a running prefetch waits for it rather than fetching again.
     """
-    error_types = {
-        400: "Bad Request",
-        404: "Not Found", 
-        500: "Internal Server Error",
-        503: "Service Unavailable"
-    }
-    return error_types.get(status_code, "Unknown Error")
+    user_data = dynamodb_lookup_user_data(user_id)
+    return [
+        _prefetch_executor.submit(dynamodb_lookup_plants_batch, user_data['plants']),
+        _prefetch_executor.submit(fetch_weather, user_data['latitude'], user_data['longitude']),
+    ]
 
 
-def validate_user_id(user_id: Any) -> tuple[bool, str]:
+def precheck_user(user_id: str) -> Optional[Dict[str, Any]]:
     """
-    Validate user_id format and content.
-    
-    Args:
-        user_id: The user_id value to validate
-        
-    Returns:
-        tuple: (is_valid: bool, error_message: str)
+    Look the user up before the model is invoked and settle the cases with nothing to advise on.
+    Returns a canned {"summary", "details"} response for incomplete locations or an empty plant
+    list, or None when the agent should run. An unknown user raises ValueError, like the tool does.
+    The lookup is cached, so the agent's own lookup for the same user costs nothing extra.
     """
-    if user_id is None:
-        return False, "'user_id' field is required in the request body."
-    
-    if not isinstance(user_id, str):
-        return False, "'user_id' must be a string."
-    
-    if not user_id.strip():
-        return False, "'user_id' cannot be empty or contain only whitespace."
-    
-    # Check for basic format requirements (alphanumeric, underscore, hyphen allowed)
-    import re
-    if not re.match(r'^[a-zA-Z0-9_-]+$', user_id.strip()):
-        return False, "'user_id' contains invalid characters. Only letters, numbers, underscores, and hyphens are allowed."
-    
-    # Check length constraints
-    if len(user_id.strip()) < 1:
-        return False, "'user_id' must be at least 1 character long."
-    
-    if len(user_id.strip()) > 50:
-        return False, "'user_id' must be 50 characters or less."
-    
-    return True, ""
+    user_data = dynamodb_lookup_user_data(user_id)
+    if 'error' in user_data:
+        return {"summary": user_data['error'], "details": {}}
+    if not user_data.get('plants'):
+        return {
+            "summary": f"No plants are registered for user ID '{user_id}'. Add plants to your garden to get weather advice.",
+            "details": {},
+        }
+    return None
+
+
+def response_cache_key(user_id: str) -> str:
+    """Key for a user's advice in the current cache window."""
+    time_bucket = int(time.time() // RESPONSE_CACHE_TTL_SECONDS)
+    return hashlib.blake2b(f"{user_id}:{time_bucket}".encode(), digest_size=16).hexdigest()
+
 
+def select_agent(user_prompt: str) -> Agent:
+    """Pick the agent specialized for the prompt's path: direct coordinates or user_id lookup."""
+    if DIRECT_PROMPT_PATTERN.search(user_prompt):
+        return direct_weather_agent
+    return plant_weather_agent
 
-def handle_database_error(error: Exception, user_id: str = None) -> tuple[int, str]:
+
+# Fields every API Gateway proxy event carries
+API_GATEWAY_EVENT_KEYS = frozenset(('httpMethod', 'path', 'headers', 'body'))
+
+
+def is_api_gateway_event(event: Dict[str, Any]) -> bool:
     """
-    Handle database-related errors and return appropriate status code and message.
-    
-    Args:
-        error: The exception that occurred
-        user_id: The user_id that was being processed
-        
-    Returns:
-        tuple: (status_code: int, error_message: str)
+    Detect if the event is from API Gateway by checking for API Gateway-specific fields.
     """
-    error_str = str(error).lower()
-    
-    # Check for user not found errors
-    if "no user data found" in error_str or "no user item found" in error_str:
-        return 404, f"User not found: No user profile found for user_id: {user_id}"
-    
-    # Check for DynamoDB specific errors
-    if "resourcenotfoundexception" in error_str:
-        return 404, f"User not found: No user profile found for user_id: {user_id}"
-    
-    if "accessdeniedexception" in error_str or "unauthorizedoperation" in error_str:
-        return 500, "Database access error. Please contact support."
-    
-    if "throttlingexception" in error_str or "provisionedthroughputexceeded" in error_str:
-        return 503, "Service temporarily unavailable due to high demand. Please try again later."
-    
-    if "validationexception" in error_str:
-        return 400, f"Invalid user_id format: {user_id}"
-    
-    # Generic database error
-    return 500, "A database error occurred while processing your request."
+    return API_GATEWAY_EVENT_KEYS.issubset(event)
 
 
-def handle_ai_service_error(error: Exception) -> tuple[int, str]:
+def parse_api_gateway_request(event: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Handle AI service (Bedrock) related errors and return appropriate status code and message.
-    
-    Args:
-        error: The exception that occurred
-        
-    Returns:
-        tuple: (status_code: int, error_message: str)
+    Parse API Gateway proxy event to extract request data.
     """
-    error_str = str(error).lower()
+    # Parse the body if it exists and is a string
+    body = event.get('body')
+    if body and isinstance(body, str):
+        try:
+            request_data = json_loads(body)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON in request body: {str(e)}")
+    elif body and isinstance(body, dict):
+        request_data = body
+    else:
+        request_data = {}
     
-    # Check for Bedrock specific errors
-    if "bedrock" in error_str or "nova" in error_str:
-        if "throttling" in error_str or "rate" in error_str:
-            return 503, "AI service temporarily unavailable due to high demand. Please try again later."
-        elif "access" in error_str or "unauthorized" in error_str:
-            return 500, "AI service access error. Please contact support."
-        else:
-            return 503, "AI service temporarily unavailable. Please try again later."
+    # Extract headers (case-insensitive)
+    headers = event.get('headers', {})
     
-    # Check for weather service errors
-    if "weather" in error_str or "open-meteo" in error_str or "http_request" in error_str:
-        return 503, "Weather service temporarily unavailable. Please try again later."
+    # Extract query parameters
+    query_params = event.get('queryStringParameters') or {}
     
-    # Generic service error
-    return 503, "External service temporarily unavailable. Please try again later."
+    return {
+        'request_data': request_data,
+        'headers': headers,
+        'query_params': query_params,
+        'http_method': event.get('httpMethod'),
+        'path': event.get('path')
+    }
 
 
-def extract_weather_conditions_from_response(agent_response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def _is_advice_response(value: Any) -> bool:
+    """Check that a parsed answer has the advice shape: a string summary and a details object."""
+    return (
+        isinstance(value, dict)
+        and isinstance(value.get("summary"), str)
+        and isinstance(value.get("details"), dict)
+    )
+
+
+def _parse_advice(agent_result: Any) -> Optional[Dict[str, Any]]:
     """
-    Extract weather conditions from the agent response for frontend display.
-    This parses the agent's detailed response to find weather information.
+    Return the {"summary", "details"} advice object in the agent's result, or None when the
+    model answered in free text. The JSON object is parsed once with the fast JSON loader.
     """
-    try:
-        # Look for weather information in the summary or details
-        summary = agent_response.get("summary", "")
-        details = agent_response.get("details", {})
-        
-        # Initialize weather conditions structure
-        weather_conditions = {}
-        
-        # Try to extract temperature, humidity, and general conditions from the response text
-        # This is a simple extraction - in a production system, you might want to 
-        # store weather data separately during the agent processing
-        
-        # Look for temperature mentions
-        import re
-        temp_match = re.search(r'(\d+)°?[CF]?', summary + " " + str(details))
-        if temp_match:
-            weather_conditions["temperature"] = int(temp_match.group(1))
-        
-        # Look for humidity mentions
-        humidity_match = re.search(r'(\d+)%.*humidity|humidity.*(\d+)%', summary + " " + str(details), re.IGNORECASE)
-        if humidity_match:
-            humidity_value = humidity_match.group(1) or humidity_match.group(2)
-            weather_conditions["humidity"] = int(humidity_value)
-        
-        # Look for general weather conditions (order matters - more specific first)
-        weather_keywords = ["partly cloudy", "overcast", "sunny", "cloudy", "rainy", "windy", "clear"]
-        text_to_search = (summary + " " + str(details)).lower()
-        for keyword in weather_keywords:
-            if keyword in text_to_search:
-                weather_conditions["condition"] = keyword
-                break
-        
-        # Only return weather conditions if we found at least one piece of weather data
-        return weather_conditions if weather_conditions else None
-        
-    except Exception as e:
-        print(f"Error extracting weather conditions: {e}")
-        return None
+    if isinstance(agent_result, dict):
+        return agent_result if _is_advice_response(agent_result) else None
+
+    text = str(agent_result).strip()
+    # Tolerate prose or a ```json fence around the object
+    start, end = text.find('{'), text.rfind('}')
+    if start != -1 and end > start:
+        try:
+            parsed = json_loads(text[start:end + 1])
+        except ValueError:
+            return None
+        if _is_advice_response(parsed):
+            return parsed
+    return None
+
+
+def _free_text_response(agent_result: Any) -> Dict[str, Any]:
+    """Wrap an answer that is not an advice object; free text is returned as the summary."""
+    if isinstance(agent_result, dict):
+        return agent_result
+    return {"summary": str(agent_result).strip(), "details": {}}
+
+
+def parse_agent_response(agent_result: Any) -> Dict[str, Any]:
+    """
+    Turn the agent's result into the {"summary", "details"} dict returned to callers.
+    The model is prompted to answer with a JSON object; free-text answers are returned as the summary.
+    """
+    return _parse_advice(agent_result) or _free_text_response(agent_result)
+
+
+def handle_options(request_id: str, timestamp: str = None) -> Dict[str, Any]:
+    """
+    Answer a CORS preflight request. API Gateway normally serves preflight from its
+    MOCK integration; this covers OPTIONS requests proxied through to the Lambda.
+    """
+    return create_api_gateway_response(200, {}, request_id=request_id, timestamp=timestamp)
 
 
 def lambda_handler(event: Dict[str, Any], _context) -> Dict[str, Any]:
@@ -508,17 +892,26 @@ def lambda_handler(event: Dict[str, Any], _context) -> Dict[str, Any]:
     Lambda handler that supports both direct invocation and API Gateway proxy events.
     Enhanced with improved response formatting including user_id, timestamp, and weather conditions.
     """
-    request_id = str(uuid.uuid4())
+    request_id = new_request_id()
+    now_iso = utc_timestamp()
+    
+    # Handle OPTIONS request for CORS preflight before any other work — no auth check
+    if event.get('httpMethod') == 'OPTIONS':
+        return handle_options(request_id, now_iso)
+    
     user_id = None
+    is_apigw = is_api_gateway_event(event)
+    # Pick the response format once; every return below goes through it
+    respond = partial(
+        create_api_gateway_response if is_apigw else create_direct_response,
+        request_id=request_id,
+        timestamp=now_iso
+    )
     
     try:
         # Check if this is an API Gateway event
-        if is_api_gateway_event(event):
-            print(f"Processing API Gateway event - Request ID: {request_id}")
-            
-            # Handle OPTIONS request for CORS preflight — no auth check
-            if event.get('httpMethod') == 'OPTIONS':
-                return create_api_gateway_response(200, {}, request_id=request_id)
+        if is_apigw:
+            logger.info("Processing API Gateway event - Request ID: %s", request_id)
             
             # Extract identity from validated JWT claims
             try:
@@ -527,12 +920,7 @@ def lambda_handler(event: Dict[str, Any], _context) -> Dict[str, Any]:
                 logger.info("%s Request received", log_prefix)
             except AuthError as e:
                 logger.warning("Auth failure: %s sub=%s", e.error_code, _safe_sub(event))
-                return create_api_gateway_response(
-                    e.status_code,
-                    error_message=e.message,
-                    error_code=e.error_code,
-                    request_id=request_id,
-                )
+                return respond(e.status_code, error_message=e.message, error_code=e.error_code)
             
             # Resolve garden via UserProfiles mapping
             try:
@@ -540,19 +928,14 @@ def lambda_handler(event: Dict[str, Any], _context) -> Dict[str, Any]:
                 logger.info("%s Resolved garden_id=%s user_id=%s", log_prefix, garden_id, legacy_user_id)
             except AuthError as e:
                 logger.warning("%s Garden resolution failed: %s", log_prefix, e.error_code)
-                return create_api_gateway_response(
-                    e.status_code,
-                    error_message=e.message,
-                    error_code=e.error_code,
-                    request_id=request_id,
-                )
+                return respond(e.status_code, error_message=e.message, error_code=e.error_code)
             
             # Ignore any user_id from request body — use legacy_user_id from mapping
             user_id = legacy_user_id
-            user_prompt = f"Give me plant advice for user_id {user_id}"
+            user_prompt = USER_PROMPT_TEMPLATE.format(user_id=user_id)
         
         else:
-            print(f"Processing direct Lambda invocation - Request ID: {request_id}")
+            logger.info("Processing direct Lambda invocation - Request ID: %s", request_id)
             # Direct Lambda invocation - support both user_id and prompt formats
             user_id = event.get('user_id')
             user_prompt = event.get('prompt')
@@ -561,68 +944,60 @@ def lambda_handler(event: Dict[str, Any], _context) -> Dict[str, Any]:
                 # Validate user_id format using enhanced validation
                 is_valid, validation_error = validate_user_id(user_id)
                 if not is_valid:
-                    return {
-                        "details": {},
-                        "summary": f"Error: {validation_error}",
-                        "timestamp": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
-                        "user_id": user_id if isinstance(user_id, str) else None,
-                        "request_id": request_id
-                    }
+                    return respond(
+                        400,
+                        error_message=f"Error: {validation_error}",
+                        user_id=user_id if isinstance(user_id, str) else None
+                    )
                 # Clean the user_id (strip whitespace)
                 user_id = user_id.strip()
                 # Construct prompt from user_id - this will trigger the dynamodb_lookup_user_data tool
-                user_prompt = f"Give me plant advice for user_id {user_id}"
+                user_prompt = USER_PROMPT_TEMPLATE.format(user_id=user_id)
             elif user_prompt:
                 # Use existing prompt (backward compatibility)
-                pass
+                user_id_match = USER_ID_PROMPT_PATTERN.search(user_prompt)
+                if user_id_match:
+                    user_id = user_id_match.group(1)
             else:
-                return {
-                    "details": {},
-                    "summary": "Error: Either 'user_id' or 'prompt' must be provided in the event.",
-                    "timestamp": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
-                    "request_id": request_id
-                }
-
-        # Initialize the agent with all necessary tools
-        plant_weather_agent = Agent(
-            system_prompt=WEATHER_SYSTEM_PROMPT,
-            tools=[http_request, dynamodb_lookup_user_data, dynamodb_lookup_plant_data], 
-            model="amazon.nova-lite-v1:0",
-            region=BEDROCK_REGION,
-        )
-
-        # Process the request
-        print(f"Processing agent request for user_id: {user_id}")
-        response = plant_weather_agent(user_prompt)
-        
-        # Extract weather conditions from the agent response
-        weather_conditions = extract_weather_conditions_from_response(response)
-        
-        # Return appropriate response format
-        if is_api_gateway_event(event):
-            return create_api_gateway_response(
-                200, 
-                response, 
-                user_id=user_id,
-                weather_conditions=weather_conditions,
-                request_id=request_id
-            )
+                return respond(400, error_message="Error: Either 'user_id' or 'prompt' must be provided in the event.")
+
+        # Only the standard per-user request is cached; free-form prompts may ask anything
+        cache_key = None
+        if user_id and user_prompt == USER_PROMPT_TEMPLATE.format(user_id=user_id):
+            cache_key = response_cache_key(user_id)
+        cached = _response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            response, weather_conditions = cached
         else:
-            # Direct invocation - return enhanced response format
-            enhanced_response = {
-                "advice": response.get("summary", ""),
-                "details": response.get("details", {}),
-                "timestamp": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
-                "request_id": request_id
-            }
-            if user_id:
-                enhanced_response["user_id"] = user_id
-            if weather_conditions:
-                enhanced_response["weather_conditions"] = weather_conditions
-            return enhanced_response
+            # Settle trivial cases in code so Bedrock is only invoked when there is advice to give
+            response = precheck_user(user_id) if user_id else None
+            weather_conditions = None
+        if cached is None and response is None:
+            # Process the request; clear history so requests never see each other's conversation
+            logger.info("Processing agent request for user_id: %s", user_id)
+            _request_weather.clear()
+            prefetches = prefetch_user_inputs(user_id) if user_id else []
+            try:
+                weather_agent = select_agent(user_prompt)
+                weather_agent.messages = []
+                agent_result = weather_agent(user_prompt)
+                advice = _parse_advice(agent_result)
+                response = advice or _free_text_response(agent_result)
+            finally:
+                # Never leave lookups running into the next invocation
+                wait(prefetches)
+
+            # Report the exact values the weather tool returned; fall back to reading them from the advice text
+            weather_conditions = dict(_request_weather) or extract_weather_conditions_from_response(response)
+            # Only cache real advice built on a successful weather lookup; a free-text fallback or
+            # an answer relaying a tool error would otherwise be served for the whole cache window
+            if cache_key and advice and _request_weather:
+                _response_cache.put(cache_key, (response, weather_conditions))
+        
+        return respond(200, response, user_id=user_id, weather_conditions=weather_conditions)
             
     except Exception as e:
-        print(f"Agent processing error: {e}")
+        logger.error("Agent processing error for request %s: %s", request_id, e)
         
         # Determine error type and appropriate response
         error_str = str(e).lower()
@@ -638,21 +1013,4 @@ def lambda_handler(event: Dict[str, Any], _context) -> Dict[str, Any]:
             status_code = 500
             error_message = "An internal error occurred while processing your request."
         
-        # Log detailed error for debugging (but don't expose to user)
-        print(f"Detailed error for request {request_id}: {str(e)}")
-        
-        if is_api_gateway_event(event):
-            return create_api_gateway_response(
-                status_code, 
-                error_message=error_message,
-                user_id=user_id,
-                request_id=request_id
-            )
-        else:
-            return {
-                "details": {},
-                "summary": error_message,
-                "timestamp": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
-                "user_id": user_id,
-                "request_id": request_id
-            }
\ No newline at end of file
+        return respond(status_code, error_message=error_message, user_id=user_id)
\ No newline at end of file
@@ -6,6 +6,11 @@ import logging
 import os
 from typing import Any
 
+try:
+    import orjson
+except ImportError:  # orjson ships in the Lambda layer; fall back to stdlib json elsewhere
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 # Lazily initialised so unit tests can mock before the client is created
@@ -19,6 +24,13 @@ def _get_client():
     return _lambda_client
 
 
+def _dumps_payload(value: dict[str, Any]) -> bytes:
+    """Encode an invocation payload; orjson returns bytes directly, so no extra encode step."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
 def trigger_async(payload: dict[str, Any], request_id: str) -> None:
     """Invoke this Lambda function asynchronously with the given payload.
 
@@ -43,7 +55,7 @@ def trigger_async(payload: dict[str, Any], request_id: str) -> None:
         _get_client().invoke(
             FunctionName=fn_name,
             InvocationType="Event",  # fire-and-forget
-            Payload=json.dumps({"async_task": payload}),
+            Payload=_dumps_payload({"async_task": payload}),
         )
         logger.info(
             "[request_id=%s] Async task triggered: action=%s",
@@ -10,8 +10,21 @@ from aws_lambda_powertools.utilities.typing import LambdaContext
 
 from src.api.errors import ApiError, make_error_response
 
+try:
+    import orjson
+except ImportError:  # orjson ships in the Lambda layer; fall back to stdlib json elsewhere
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+
+def _dumps(value: Any) -> str:
+    """Encode a response body, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
 # ---------------------------------------------------------------------------
 # Powertools app — CORS config satisfies Req 1.6 / 22.2 globally
 # ---------------------------------------------------------------------------
@@ -32,7 +45,7 @@ def handle_api_error(exc: ApiError):
         status_code=exc.status_code,
         content_type="application/json",
         headers={"Access-Control-Allow-Origin": "*"},
-        body=json.dumps({
+        body=_dumps({
             "error": exc.error,
             "message": exc.message,
             "request_id": request_id,
@@ -49,7 +62,7 @@ def handle_unhandled(exc: Exception):
         status_code=500,
         content_type="application/json",
         headers={"Access-Control-Allow-Origin": "*"},
-        body=json.dumps({
+        body=_dumps({
             "error": "internal_error",
             "message": "An unexpected error occurred.",
             "request_id": request_id,
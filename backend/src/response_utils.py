@@ -0,0 +1,379 @@
+"""
+Response formatting, validation and error classification for the gardening agent Lambda.
+
+Pure helpers with no AWS or Strands dependencies, kept apart from agent.py so they can be
+imported and tested on their own.
+"""
+import json
+import logging
+import re
+import string
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Any, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson ships in the Lambda layer; fall back to stdlib json elsewhere
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Bound once so minting a request id skips the module attribute lookup
+_uuid4 = uuid.uuid4
+
+
+def _json_default(value: Any) -> Any:
+    """Serialise values the JSON encoders do not handle natively."""
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    if isinstance(value, set):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_dumps(value: Any) -> str:
+    """
+    Serialise to a JSON string, using orjson when available.
+    The stdlib fallback matches orjson's compact, unescaped UTF-8 output.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default).decode()
+    return json.dumps(value, default=_json_default, separators=(',', ':'), ensure_ascii=False)
+
+
+def json_loads(value: str | bytes) -> Any:
+    """
+    Parse a JSON document, using orjson when available.
+    orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch the latter.
+    """
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+
+def new_request_id() -> str:
+    """A fresh id for tracing one request through the logs and its response; always the dashed UUID4 form."""
+    return str(_uuid4())
+
+
+def utc_timestamp() -> str:
+    """Current UTC time as an ISO 8601 string with millisecond precision and a trailing Z."""
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+# Shared by every API Gateway response; the Lambda runtime only serialises it, never mutates it
+CORS_HEADERS = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+    "Access-Control-Allow-Methods": "POST,OPTIONS"
+}
+
+
+def _build_error_body(
+    status_code: int,
+    error_message: str,
+    error_code: str,
+    user_id: str,
+    request_id: str,
+    timestamp: str
+) -> Dict[str, Any]:
+    """API Gateway error body, built in one expression."""
+    return {
+        "statusCode": status_code,
+        "error": error_code or get_error_type_from_status(status_code),
+        "message": error_message,
+        "request_id": request_id or new_request_id(),
+        "timestamp": timestamp,
+        **({"user_id": user_id} if user_id else {})
+    }
+
+
+def _build_success_body(
+    status_code: int,
+    body: Dict[str, Any],
+    user_id: str,
+    weather_conditions: Dict[str, Any],
+    timestamp: str
+) -> Dict[str, Any]:
+    """API Gateway success body, built in one expression."""
+    body = body or {}
+    return {
+        "statusCode": status_code,
+        "advice": body.get("summary", ""),
+        "details": body.get("details", {}),
+        "timestamp": timestamp,
+        **({"user_id": user_id} if user_id else {}),
+        **({"weather_conditions": weather_conditions} if weather_conditions else {})
+    }
+
+
+def create_api_gateway_response(
+    status_code: int, 
+    body: Dict[str, Any] = None, 
+    error_message: str = None,
+    error_code: str = None,
+    user_id: str = None,
+    weather_conditions: Dict[str, Any] = None,
+    request_id: str = None,
+    timestamp: str = None
+) -> Dict[str, Any]:
+    """
+    Create a properly formatted API Gateway response with CORS headers.
+    Enhanced to include user_id, timestamp, weather conditions, and request tracking.
+    """
+    timestamp = timestamp or utc_timestamp()
+    
+    if error_message:
+        response_body = _build_error_body(status_code, error_message, error_code, user_id, request_id, timestamp)
+    else:
+        response_body = _build_success_body(status_code, body, user_id, weather_conditions, timestamp)
+    
+    return {
+        "statusCode": status_code,
+        "headers": CORS_HEADERS,
+        "body": json_dumps(response_body)
+    }
+
+
+def create_direct_response(
+    status_code: int,
+    body: Dict[str, Any] = None,
+    error_message: str = None,
+    error_code: str = None,
+    user_id: str = None,
+    weather_conditions: Dict[str, Any] = None,
+    request_id: str = None,
+    timestamp: str = None
+) -> Dict[str, Any]:
+    """
+    Create the response returned to direct Lambda invocations. Takes the same arguments as
+    create_api_gateway_response so the handler can build either format the same way;
+    status_code and error_code only matter to API Gateway clients.
+    """
+    timestamp = timestamp or utc_timestamp()
+
+    if error_message:
+        response = {
+            "details": {},
+            "summary": error_message,
+            "timestamp": timestamp,
+            "request_id": request_id
+        }
+        if user_id:
+            response["user_id"] = user_id
+        return response
+
+    body = body or {}
+    response = {
+        "advice": body.get("summary", ""),
+        "details": body.get("details", {}),
+        "timestamp": timestamp,
+        "request_id": request_id
+    }
+    if user_id:
+        response["user_id"] = user_id
+    if weather_conditions:
+        response["weather_conditions"] = weather_conditions
+    return response
+
+
+# HTTP status codes to error types for consistent error responses
+ERROR_TYPES = {
+    400: "Bad Request",
+    404: "Not Found",
+    500: "Internal Server Error",
+    503: "Service Unavailable"
+}
+
+
+def get_error_type_from_status(status_code: int) -> str:
+    """
+    Map HTTP status codes to error types for consistent error responses.
+    """
+    return ERROR_TYPES.get(status_code, "Unknown Error")
+
+
+# Letters, numbers, underscores and hyphens only
+USER_ID_CHARACTERS = frozenset(string.ascii_letters + string.digits + '_-')
+
+
+def validate_user_id(user_id: Any) -> tuple[bool, str]:
+    """
+    Validate user_id format and content.
+    
+    Args:
+        user_id: The user_id value to validate
+        
+    Returns:
+        tuple: (is_valid: bool, error_message: str)
+    """
+    # One type check on the success path; only failures tell None apart from other types
+    if not isinstance(user_id, str):
+        if user_id is None:
+            return False, "'user_id' field is required in the request body."
+        return False, "'user_id' must be a string."
+    
+    stripped = user_id.strip()
+    if not stripped:
+        return False, "'user_id' cannot be empty or contain only whitespace."
+    
+    # Check length first so oversized input is rejected without scanning it
+    if len(stripped) > 50:
+        return False, "'user_id' must be 50 characters or less."
+    
+    # Check for basic format requirements (alphanumeric, underscore, hyphen allowed)
+    if not USER_ID_CHARACTERS.issuperset(stripped):
+        return False, "'user_id' contains invalid characters. Only letters, numbers, underscores, and hyphens are allowed."
+    
+    return True, ""
+
+
+# (keywords, status_code, message) in priority order; the first rule with a keyword in the error wins
+DATABASE_ERROR_RULES = (
+    # User not found, including DynamoDB's ResourceNotFoundException
+    (("no user data found", "no user item found", "resourcenotfoundexception"), 404,
+     "User not found: No user profile found for user_id: {user_id}"),
+    (("accessdeniedexception", "unauthorizedoperation"), 500,
+     "Database access error. Please contact support."),
+    (("throttlingexception", "provisionedthroughputexceeded"), 503,
+     "Service temporarily unavailable due to high demand. Please try again later."),
+    (("validationexception",), 400,
+     "Invalid user_id format: {user_id}"),
+)
+
+BEDROCK_ERROR_RULES = (
+    (("throttling", "rate"), 503, "AI service temporarily unavailable due to high demand. Please try again later."),
+    (("access", "unauthorized"), 500, "AI service access error. Please contact support."),
+)
+BEDROCK_ERROR_PATTERN = re.compile(r"bedrock|nova", re.IGNORECASE)
+WEATHER_ERROR_PATTERN = re.compile(r"weather|open-meteo|http_request", re.IGNORECASE)
+
+
+def _compile_error_rules(rules: tuple) -> tuple[re.Pattern, dict]:
+    """Build one case-insensitive alternation over all rule keywords plus a keyword -> (rank, status, message) map."""
+    lookup = {
+        keyword: (rank, status_code, message)
+        for rank, (keywords, status_code, message) in enumerate(rules)
+        for keyword in keywords
+    }
+    pattern = re.compile(
+        "|".join(re.escape(keyword) for keyword in sorted(lookup, key=len, reverse=True)),
+        re.IGNORECASE,
+    )
+    return pattern, lookup
+
+
+_DATABASE_ERROR_MATCHER = _compile_error_rules(DATABASE_ERROR_RULES)
+_BEDROCK_ERROR_MATCHER = _compile_error_rules(BEDROCK_ERROR_RULES)
+
+
+def _match_error_rule(error_str: str, matcher: tuple[re.Pattern, dict]) -> Optional[tuple[int, str]]:
+    """Return (status_code, message) for the highest-priority rule with a keyword in error_str."""
+    pattern, lookup = matcher
+    best = min((lookup[m.group(0).lower()] for m in pattern.finditer(error_str)), default=None)
+    return best[1:] if best else None
+
+
+def handle_database_error(error: Exception, user_id: str = None) -> tuple[int, str]:
+    """
+    Handle database-related errors and return appropriate status code and message.
+    
+    Args:
+        error: The exception that occurred
+        user_id: The user_id that was being processed
+        
+    Returns:
+        tuple: (status_code: int, error_message: str)
+    """
+    match = _match_error_rule(str(error), _DATABASE_ERROR_MATCHER)
+    if match:
+        status_code, message = match
+        return status_code, message.format(user_id=user_id)
+    
+    # Generic database error
+    return 500, "A database error occurred while processing your request."
+
+
+def handle_ai_service_error(error: Exception) -> tuple[int, str]:
+    """
+    Handle AI service (Bedrock) related errors and return appropriate status code and message.
+    
+    Args:
+        error: The exception that occurred
+        
+    Returns:
+        tuple: (status_code: int, error_message: str)
+    """
+    error_str = str(error)
+    
+    # Check for Bedrock specific errors
+    if BEDROCK_ERROR_PATTERN.search(error_str):
+        return (
+            _match_error_rule(error_str, _BEDROCK_ERROR_MATCHER)
+            or (503, "AI service temporarily unavailable. Please try again later.")
+        )
+    
+    # Check for weather service errors
+    if WEATHER_ERROR_PATTERN.search(error_str):
+        return 503, "Weather service temporarily unavailable. Please try again later."
+    
+    # Generic service error
+    return 503, "External service temporarily unavailable. Please try again later."
+
+
+# Condition words the frontend understands, most specific first
+WEATHER_CONDITION_KEYWORDS = ("partly cloudy", "overcast", "sunny", "cloudy", "rainy", "windy", "clear")
+
+# Weather values mentioned in the advice text, e.g. "18°C", "humidity of 85%" or "sunny", matched in
+# one pass. Humidity is tried before temperature so its number is not read as a temperature, and the
+# gap between number and word is bounded so long advice text cannot trigger heavy backtracking.
+WEATHER_TEXT_PATTERN = re.compile(
+    r'(?P<humidity>\d+)\s*%[^%]{0,40}?humidity'
+    r'|humidity[^%]{0,40}?(?P<humidity_after>\d+)\s*%'
+    r'|(?P<temperature>\d+)°?[CF]?'
+    r'|(?P<condition>' + '|'.join(WEATHER_CONDITION_KEYWORDS) + r')',
+    re.IGNORECASE,
+)
+
+
+def extract_weather_conditions_from_response(agent_response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Extract weather conditions from the agent response for frontend display.
+    This parses the agent's detailed response to find weather information.
+    """
+    try:
+        # Look for weather information in the summary or details
+        summary = agent_response.get("summary", "")
+        details = agent_response.get("details", {})
+        
+        # Initialize weather conditions structure
+        weather_conditions = {}
+        
+        # Search the detail values rather than the dict's repr, so keys, quotes and braces are skipped
+        parts = [summary]
+        if isinstance(details, dict):
+            parts.extend(str(value) for value in details.values())
+        else:
+            parts.append(str(details))
+        
+        # Take the first temperature, humidity and condition mentioned, scanning the text once
+        for match in WEATHER_TEXT_PATTERN.finditer(" ".join(parts)):
+            humidity = match.group("humidity") or match.group("humidity_after")
+            if humidity:
+                weather_conditions.setdefault("humidity", int(humidity))
+            elif match.group("temperature"):
+                weather_conditions.setdefault("temperature", int(match.group("temperature")))
+            else:
+                weather_conditions.setdefault("condition", match.group("condition").lower())
+            if len(weather_conditions) == 3:
+                break
+        
+        # Only return weather conditions if we found at least one piece of weather data
+        return weather_conditions if weather_conditions else None
+        
+    except Exception as e:
+        logger.warning("Error extracting weather conditions: %s", e)
+        return None
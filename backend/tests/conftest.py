@@ -0,0 +1,41 @@
+"""
+Shared test setup: put src/ on the import path, stub the strands SDK, and import
+agent once with boto3 mocked so no test module builds real DynamoDB resources.
+
+This runs at conftest import, before test modules are collected, so their
+module-level `import agent` / `from agent import ...` all reuse this instance.
+"""
+import sys
+import os
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# ---------------------------------------------------------------------------
+# Stub out heavy dependencies so agent.py can be imported without AWS/strands
+# ---------------------------------------------------------------------------
+for _mod in ("strands", "strands_tools", "strands.agent", "strands.tools"):
+    if _mod not in sys.modules:
+        sys.modules[_mod] = MagicMock()
+
+_strands_stub = sys.modules["strands"]
+_strands_stub.tool = lambda f: f
+_strands_stub.Agent = MagicMock()
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+with patch("boto3.resource"), patch("boto3.client"):
+    import agent  # noqa: F401
+
+
+# No long runs of one character, so it cannot collide with generated tokens in the log tests
+_FIXED_REQUEST_ID = uuid.UUID("f1e2d3c4-b5a6-4978-8695-a4b3c2d1e0f9")
+_FIXED_TIMESTAMP = "2025-01-07T10:30:00Z"
+
+
+@pytest.fixture(autouse=True)
+def _frozen_request_metadata(monkeypatch):
+    """Give every handler call the same request_id and timestamp; tests only check they are present."""
+    monkeypatch.setattr(agent, "new_request_id", lambda: str(_FIXED_REQUEST_ID))
+    monkeypatch.setattr(agent, "utc_timestamp", lambda: _FIXED_TIMESTAMP)
@@ -0,0 +1,50 @@
+"""
+Helpers shared by the test modules, including the ones that also run as
+standalone scripts (`python tests/test_error_handling.py`).
+"""
+import json
+import os
+import sys
+from functools import lru_cache
+from unittest.mock import MagicMock
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder where orjson isn't installed
+    orjson = None
+
+# Progress output is for running a test file as a script; pytest runs stay quiet
+_RUN_AS_SCRIPT = os.path.basename(getattr(sys.modules["__main__"], "__file__", None) or "").startswith("test_")
+
+
+def log(*args):
+    """Print test progress when a test file is run directly."""
+    if _RUN_AS_SCRIPT:
+        print(*args)
+
+
+def dumps(obj) -> str:
+    """Encode a request body; API Gateway bodies are str, not bytes."""
+    return orjson.dumps(obj).decode() if orjson else json.dumps(obj)
+
+
+def loads(body):
+    """Decode a JSON request or response body."""
+    return orjson.loads(body) if orjson else json.loads(body)
+
+
+@lru_cache(maxsize=32)
+def _parse_body(body: str):
+    return loads(body)
+
+
+def body_of(response):
+    """Parsed body of an API Gateway response; repeat lookups of the same body skip the parser."""
+    return _parse_body(response['body'])
+
+
+def user_table(item):
+    """DynamoDB Table mock whose get_item returns the given user item (or nothing)."""
+    table = MagicMock()
+    table.get_item.return_value = {"Item": item} if item else {}
+    return table
@@ -4,22 +4,47 @@ Integration test to verify the enhanced API response formatting works with mock
 This tests the complete flow without requiring AWS services.
 """
 
-import json
+
+from helpers import dumps, loads, log
+
+
+# Mock API Gateway event; the payloads below are static, so they are built once at import
+_API_GW_EVENT = {
+    "httpMethod": "POST",
+    "path": "/advice",
+    "headers": {
+        "Content-Type": "application/json"
+    },
+    "body": dumps({"user_id": "test_user_123"}),
+    "queryStringParameters": None
+}
+
+# Mock successful response data
+_MOCK_AGENT_RESPONSE = {
+    "details": {"Plant1": "Advice for plant 1"},
+    "summary": "Weather is good today with 20°C and 60% humidity"
+}
+
+_API_RESPONSE_BODY = {
+    "statusCode": 200,
+    "advice": _MOCK_AGENT_RESPONSE["summary"],
+    "details": _MOCK_AGENT_RESPONSE["details"],
+    "timestamp": "2025-01-07T10:30:00Z",
+    "user_id": "test_user",
+    "weather_conditions": {"temperature": 20, "humidity": 60}
+}
+
+_DIRECT_RESPONSE = {
+    "advice": _MOCK_AGENT_RESPONSE["summary"],
+    "details": _MOCK_AGENT_RESPONSE["details"],
+    "timestamp": "2025-01-07T10:30:00Z",
+    "user_id": "test_user",
+    "request_id": "test-123"
+}
 
 def test_api_gateway_event_structure():
     """Test that we can properly identify and handle API Gateway events"""
-    print("Testing API Gateway event structure...")
-    
-    # Mock API Gateway event
-    api_gateway_event = {
-        "httpMethod": "POST",
-        "path": "/advice",
-        "headers": {
-            "Content-Type": "application/json"
-        },
-        "body": json.dumps({"user_id": "test_user_123"}),
-        "queryStringParameters": None
-    }
+    log("Testing API Gateway event structure...")
     
     # Test event detection
     def is_api_gateway_event(event):
@@ -30,15 +55,15 @@ def test_api_gateway_event_structure():
             'body' in event
         )
     
-    assert is_api_gateway_event(api_gateway_event) == True
-    print("✓ API Gateway event detection works")
+    assert is_api_gateway_event(_API_GW_EVENT) == True
+    log("✓ API Gateway event detection works")
     
     # Test request parsing
     def parse_api_gateway_request(event):
         try:
             body = event.get('body')
             if body and isinstance(body, str):
-                request_data = json.loads(body)
+                request_data = loads(body)
             elif body and isinstance(body, dict):
                 request_data = body
             else:
@@ -54,18 +79,18 @@ def test_api_gateway_event_structure():
                 'http_method': event.get('httpMethod'),
                 'path': event.get('path')
             }
-        except json.JSONDecodeError as e:
+        except ValueError as e:  # json and orjson decode errors are both ValueErrors
             raise ValueError(f"Invalid JSON in request body: {str(e)}")
     
-    parsed = parse_api_gateway_request(api_gateway_event)
+    parsed = parse_api_gateway_request(_API_GW_EVENT)
     assert parsed['request_data']['user_id'] == "test_user_123"
     assert parsed['http_method'] == "POST"
     assert parsed['path'] == "/advice"
-    print("✓ API Gateway request parsing works")
+    log("✓ API Gateway request parsing works")
 
 def test_direct_invocation_structure():
     """Test direct Lambda invocation format"""
-    print("Testing direct Lambda invocation structure...")
+    log("Testing direct Lambda invocation structure...")
     
     # Mock direct invocation event
     direct_event = {
@@ -75,51 +100,28 @@ def test_direct_invocation_structure():
     # Test that we can extract user_id
     user_id = direct_event.get('user_id')
     assert user_id == "test_user_456"
-    print("✓ Direct invocation parsing works")
+    log("✓ Direct invocation parsing works")
 
 def test_response_format_consistency():
     """Test that response formats are consistent"""
-    print("Testing response format consistency...")
+    log("Testing response format consistency...")
     
     # Both API Gateway and direct invocation should return similar enhanced formats
     # API Gateway wraps in HTTP response, direct invocation returns JSON directly
     
-    # Mock successful response data
-    mock_agent_response = {
-        "details": {"Plant1": "Advice for plant 1"},
-        "summary": "Weather is good today with 20°C and 60% humidity"
-    }
-    
     # Test that both formats include required fields
     required_fields = ["advice", "details", "timestamp"]
     optional_fields = ["user_id", "weather_conditions", "request_id"]
     
     # For API Gateway (wrapped in HTTP response)
-    api_response_body = {
-        "statusCode": 200,
-        "advice": mock_agent_response["summary"],
-        "details": mock_agent_response["details"],
-        "timestamp": "2025-01-07T10:30:00Z",
-        "user_id": "test_user",
-        "weather_conditions": {"temperature": 20, "humidity": 60}
-    }
-    
-    for field in required_fields:
-        assert field in api_response_body, f"Required field {field} missing from API response"
+    missing = set(required_fields).difference(_API_RESPONSE_BODY)
+    assert not missing, f"Required fields missing from API response: {missing}"
     
     # For direct invocation
-    direct_response = {
-        "advice": mock_agent_response["summary"],
-        "details": mock_agent_response["details"],
-        "timestamp": "2025-01-07T10:30:00Z",
-        "user_id": "test_user",
-        "request_id": "test-123"
-    }
-    
-    for field in required_fields:
-        assert field in direct_response, f"Required field {field} missing from direct response"
+    missing = set(required_fields).difference(_DIRECT_RESPONSE)
+    assert not missing, f"Required fields missing from direct response: {missing}"
     
-    print("✓ Response format consistency verified")
+    log("✓ Response format consistency verified")
 
 def main():
     """Run all integration tests"""
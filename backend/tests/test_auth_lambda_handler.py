@@ -27,7 +27,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 import pytest
 from hypothesis import given, settings, strategies as st
 
-from agent import lambda_handler, AuthError, _safe_sub
+from agent import lambda_handler, AuthError, _safe_sub, _TTLCache
 
 
 # ---------------------------------------------------------------------------
@@ -104,6 +104,27 @@ class MockUserProfilesTable:
 _AGENT_MODULE = "agent"
 
 
+class MockUserDataTable:
+    """DynamoDB Table mock: every user has a location and one plant, so requests reach the agent."""
+
+    def get_item(self, Key, **kwargs):
+        return {"Item": {"user_id": Key["user_id"], "latitude": "51.5", "longitude": "-0.12", "plants": ["rose"]}}
+
+
+@pytest.fixture(autouse=True, scope="module")
+def _user_with_plants():
+    """
+    The handler looks the user up before invoking the agent; serve that lookup from a mock.
+    Plant IDs and responses are not cached across tests, so every request reads the mock
+    table and reaches the (mocked) agent; no plant or weather lookups are prefetched.
+    """
+    with patch(f"{_AGENT_MODULE}.user_data_table", MockUserDataTable()), \
+         patch(f"{_AGENT_MODULE}._user_plant_ids", _TTLCache(maxsize=1, ttl=0)), \
+         patch(f"{_AGENT_MODULE}._response_cache", _TTLCache(maxsize=1, ttl=0)), \
+         patch(f"{_AGENT_MODULE}.prefetch_user_inputs", return_value=[]):
+        yield
+
+
 # ===========================================================================
 # Task 6.4 — Unit tests for lambda_handler auth path
 # Requirements: 2.1, 2.3, 2.4, 2.5, 3.4, 6.1, 9.1
@@ -133,10 +154,22 @@ class TestLambdaHandlerAuthPath:
         """
         event = make_options_event()
         agent_mock = MagicMock()
-        with patch(f"{_AGENT_MODULE}.Agent", agent_mock):
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_mock):
             lambda_handler(event, None)
         agent_mock.assert_not_called()
 
+    def test_options_request_skips_identity_and_garden_lookup(self):
+        """
+        OPTIONS request returns before JWT claims or UserProfiles are touched.
+        Requirements: 6.1
+        """
+        event = make_options_event()
+        with patch(f"{_AGENT_MODULE}.extract_user_identity") as mock_identity, \
+             patch(f"{_AGENT_MODULE}.resolve_garden_id") as mock_resolve:
+            lambda_handler(event, None)
+        mock_identity.assert_not_called()
+        mock_resolve.assert_not_called()
+
     # -----------------------------------------------------------------------
     # Valid token + matching UserProfiles → calls agent, returns 200
     # Requirements: 2.1, 2.3, 9.1
@@ -152,15 +185,33 @@ class TestLambdaHandlerAuthPath:
             {"user_id": "test_user", "cognito_sub": "valid-sub-001", "garden_id": "garden_001"}
         ])
         agent_instance = MagicMock(return_value=_FAKE_AGENT_RESPONSE)
-        agent_class = MagicMock(return_value=agent_instance)
 
-        with patch(f"{_AGENT_MODULE}.Agent", agent_class), \
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_instance), \
              patch(f"{_AGENT_MODULE}.user_profiles_table", mock_table):
             response = lambda_handler(event, None)
 
         assert response["statusCode"] == 200
         agent_instance.assert_called_once()
 
+    def test_agent_history_is_cleared_before_each_request(self):
+        """
+        The module-level Agent is reused across invocations, so its conversation
+        history must be empty whenever a new request is processed.
+        """
+        mock_table = MockUserProfilesTable([
+            {"user_id": "test_user", "cognito_sub": "valid-sub-003", "garden_id": "garden_001"}
+        ])
+        agent_instance = MagicMock(return_value=_FAKE_AGENT_RESPONSE)
+        agent_instance.messages = [{"role": "user", "content": [{"text": "previous request"}]}]
+        history_at_call = []
+        agent_instance.side_effect = lambda prompt: history_at_call.append(list(agent_instance.messages)) or _FAKE_AGENT_RESPONSE
+
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_instance), \
+             patch(f"{_AGENT_MODULE}.user_profiles_table", mock_table):
+            lambda_handler(make_lambda_event(sub="valid-sub-003"), None)
+
+        assert history_at_call == [[]]
+
     def test_valid_token_response_body_is_valid_json(self):
         """
         Successful auth path → response body is valid JSON.
@@ -171,15 +222,70 @@ class TestLambdaHandlerAuthPath:
             {"user_id": "test_user", "cognito_sub": "valid-sub-002", "garden_id": "garden_001"}
         ])
         agent_instance = MagicMock(return_value=_FAKE_AGENT_RESPONSE)
-        agent_class = MagicMock(return_value=agent_instance)
 
-        with patch(f"{_AGENT_MODULE}.Agent", agent_class), \
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_instance), \
              patch(f"{_AGENT_MODULE}.user_profiles_table", mock_table):
             response = lambda_handler(event, None)
 
         body = json.loads(response["body"])
         assert isinstance(body, dict)
 
+    def test_agent_result_text_is_parsed_into_advice(self):
+        """
+        The agent returns an AgentResult whose text is the model's JSON answer;
+        it is parsed into the advice and details of the response body.
+        """
+        mock_table = MockUserProfilesTable([
+            {"user_id": "test_user", "cognito_sub": "valid-sub-004", "garden_id": "garden_001"}
+        ])
+        agent_result = MagicMock()
+        agent_result.__str__.return_value = (
+            '```json\n{"details": {"Rose": "Water today."}, "summary": "Dry spell ahead."}\n```'
+        )
+        agent_instance = MagicMock(return_value=agent_result)
+
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_instance), \
+             patch(f"{_AGENT_MODULE}.user_profiles_table", mock_table):
+            response = lambda_handler(make_lambda_event(sub="valid-sub-004"), None)
+
+        body = json.loads(response["body"])
+        assert body["advice"] == "Dry spell ahead."
+        assert body["details"] == {"Rose": "Water today."}
+
+    def test_free_text_agent_result_becomes_summary(self):
+        """A non-JSON answer is still returned, as the summary."""
+        mock_table = MockUserProfilesTable([
+            {"user_id": "test_user", "cognito_sub": "valid-sub-005", "garden_id": "garden_001"}
+        ])
+        agent_result = MagicMock()
+        agent_result.__str__.return_value = "Your garden is fine today."
+        agent_instance = MagicMock(return_value=agent_result)
+
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_instance), \
+             patch(f"{_AGENT_MODULE}.user_profiles_table", mock_table):
+            response = lambda_handler(make_lambda_event(sub="valid-sub-005"), None)
+
+        body = json.loads(response["body"])
+        assert body["advice"] == "Your garden is fine today."
+        assert body["details"] == {}
+
+    def test_agent_json_with_wrong_shape_becomes_summary(self):
+        """JSON whose details is not an object fails validation and is returned as text."""
+        mock_table = MockUserProfilesTable([
+            {"user_id": "test_user", "cognito_sub": "valid-sub-006", "garden_id": "garden_001"}
+        ])
+        agent_result = MagicMock()
+        agent_result.__str__.return_value = '{"summary": "Frost tonight.", "details": ["Rose"]}'
+        agent_instance = MagicMock(return_value=agent_result)
+
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_instance), \
+             patch(f"{_AGENT_MODULE}.user_profiles_table", mock_table):
+            response = lambda_handler(make_lambda_event(sub="valid-sub-006"), None)
+
+        body = json.loads(response["body"])
+        assert body["advice"] == '{"summary": "Frost tonight.", "details": ["Rose"]}'
+        assert body["details"] == {}
+
     # -----------------------------------------------------------------------
     # extract_user_identity raises AuthError(401) → returns 401, agent not called
     # Requirements: 2.4, 2.5
@@ -199,7 +305,7 @@ class TestLambdaHandlerAuthPath:
             "requestContext": {},  # no authorizer
         }
         agent_mock = MagicMock()
-        with patch(f"{_AGENT_MODULE}.Agent", agent_mock):
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_mock):
             response = lambda_handler(event, None)
 
         assert response["statusCode"] == 401
@@ -212,7 +318,7 @@ class TestLambdaHandlerAuthPath:
         """
         event = make_lambda_event(sub="")
         agent_mock = MagicMock()
-        with patch(f"{_AGENT_MODULE}.Agent", agent_mock):
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_mock):
             response = lambda_handler(event, None)
 
         assert response["statusCode"] == 401
@@ -225,7 +331,7 @@ class TestLambdaHandlerAuthPath:
         """
         event = make_lambda_event(sub="   ")
         agent_mock = MagicMock()
-        with patch(f"{_AGENT_MODULE}.Agent", agent_mock):
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_mock):
             response = lambda_handler(event, None)
 
         assert response["statusCode"] == 401
@@ -237,7 +343,7 @@ class TestLambdaHandlerAuthPath:
         Requirements: 2.5
         """
         event = make_lambda_event(sub="")
-        with patch(f"{_AGENT_MODULE}.Agent", MagicMock()):
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", MagicMock()):
             response = lambda_handler(event, None)
 
         assert response["statusCode"] == 401
@@ -258,7 +364,7 @@ class TestLambdaHandlerAuthPath:
         mock_table = MockUserProfilesTable([])  # empty — no match
         agent_mock = MagicMock()
 
-        with patch(f"{_AGENT_MODULE}.Agent", agent_mock), \
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_mock), \
              patch(f"{_AGENT_MODULE}.user_profiles_table", mock_table):
             response = lambda_handler(event, None)
 
@@ -272,7 +378,7 @@ class TestLambdaHandlerAuthPath:
         """
         event = make_lambda_event(sub="valid-sub-no-garden-2")
         mock_table = MockUserProfilesTable([])
-        with patch(f"{_AGENT_MODULE}.Agent", MagicMock()), \
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", MagicMock()), \
              patch(f"{_AGENT_MODULE}.user_profiles_table", mock_table):
             response = lambda_handler(event, None)
 
@@ -290,7 +396,7 @@ class TestLambdaHandlerAuthPath:
             # garden_id key absent
         ])
         agent_mock = MagicMock()
-        with patch(f"{_AGENT_MODULE}.Agent", agent_mock), \
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_mock), \
              patch(f"{_AGENT_MODULE}.user_profiles_table", mock_table):
             response = lambda_handler(event, None)
 
@@ -390,7 +496,6 @@ def test_sub_logged_jwt_not_logged(sub, jwt_token):
         {"user_id": "test_user", "cognito_sub": sub, "garden_id": "garden_001"}
     ])
     agent_instance = MagicMock(return_value=_FAKE_AGENT_RESPONSE)
-    agent_class = MagicMock(return_value=agent_instance)
 
     # Attach a fresh in-memory handler to the "agent" logger for this run
     agent_logger = logging.getLogger("agent")
@@ -399,7 +504,7 @@ def test_sub_logged_jwt_not_logged(sub, jwt_token):
     original_level = agent_logger.level
     agent_logger.setLevel(logging.DEBUG)
     try:
-        with patch(f"{_AGENT_MODULE}.Agent", agent_class), \
+        with patch(f"{_AGENT_MODULE}.plant_weather_agent", agent_instance), \
              patch(f"{_AGENT_MODULE}.user_profiles_table", mock_table):
             lambda_handler(event, None)
 
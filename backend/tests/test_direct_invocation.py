@@ -0,0 +1,289 @@
+"""
+Tests for the direct (non-API Gateway) invocation path of lambda_handler in agent.py.
+
+Feature: direct invocation
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import agent
+from agent import lambda_handler
+from helpers import user_table
+
+_FAKE_AGENT_RESPONSE = {"summary": "advice", "details": {}}
+
+
+_prefetch_user_inputs = agent.prefetch_user_inputs
+
+
+@pytest.fixture(autouse=True)
+def _empty_caches():
+    """Start every test with cold user and response caches, and no background lookups."""
+    agent._user_cache.clear()
+    agent._user_plant_ids.clear()
+    agent._response_cache.clear()
+    with patch.object(agent, "prefetch_user_inputs", return_value=[]):
+        yield
+    agent._user_cache.clear()
+    agent._user_plant_ids.clear()
+    agent._response_cache.clear()
+
+
+_USER_WITH_PLANTS = {"user_id": "test_user", "latitude": "51.5", "longitude": "-0.12", "plants": ["rose"]}
+
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+class TestAgentSelection:
+
+    def _invoke(self, event):
+        user_agent = MagicMock(return_value=_FAKE_AGENT_RESPONSE)
+        direct_agent = MagicMock(return_value=_FAKE_AGENT_RESPONSE)
+        with patch.object(agent, "plant_weather_agent", user_agent), \
+             patch.object(agent, "direct_weather_agent", direct_agent), \
+             patch.object(agent, "user_data_table", user_table(_USER_WITH_PLANTS)):
+            lambda_handler(event, None)
+        return user_agent, direct_agent
+
+    def test_user_id_uses_user_id_agent(self):
+        user_agent, direct_agent = self._invoke({"user_id": "test_user"})
+
+        user_agent.assert_called_once_with("Give me plant advice for user_id test_user")
+        direct_agent.assert_not_called()
+
+    def test_prompt_with_coordinates_uses_direct_agent(self):
+        prompt = "What advice for plant_id 'rose_1' at lat 52.52, lon 13.41?"
+        user_agent, direct_agent = self._invoke({"prompt": prompt})
+
+        direct_agent.assert_called_once_with(prompt)
+        user_agent.assert_not_called()
+
+    def test_prompts_only_describe_their_own_path(self):
+        assert "dynamodb_lookup_plants_batch" not in agent.USER_ID_SYSTEM_PROMPT
+        assert "dynamodb_lookup_user_and_plants" not in agent.DIRECT_SYSTEM_PROMPT
+
+
+class TestShortCircuit:
+
+    def _invoke(self, event, user_item):
+        weather_agent = MagicMock(return_value=_FAKE_AGENT_RESPONSE)
+        with patch.object(agent, "plant_weather_agent", weather_agent), \
+             patch.object(agent, "user_data_table", user_table(user_item)):
+            response = lambda_handler(event, None)
+        return response, weather_agent
+
+    def test_user_without_plants_skips_agent(self):
+        response, weather_agent = self._invoke(
+            {"user_id": "test_user"}, {**_USER_WITH_PLANTS, "plants": []}
+        )
+
+        weather_agent.assert_not_called()
+        assert "no plants" in response["advice"].lower()
+        assert response["details"] == {}
+
+    def test_incomplete_location_skips_agent(self):
+        response, weather_agent = self._invoke(
+            {"user_id": "test_user"}, {"user_id": "test_user", "plants": ["rose"]}
+        )
+
+        weather_agent.assert_not_called()
+        assert "location" in response["advice"].lower()
+
+    def test_unknown_user_skips_agent(self):
+        response, weather_agent = self._invoke({"user_id": "ghost"}, None)
+
+        weather_agent.assert_not_called()
+        assert "ghost" in response["summary"]
+
+    def test_user_id_in_free_prompt_is_prechecked(self):
+        response, weather_agent = self._invoke(
+            {"prompt": "Give me plant advice for user_id test_user"}, {**_USER_WITH_PLANTS, "plants": []}
+        )
+
+        weather_agent.assert_not_called()
+        assert response["user_id"] == "test_user"
+
+    def test_user_with_plants_reaches_agent(self):
+        response, weather_agent = self._invoke({"user_id": "test_user"}, _USER_WITH_PLANTS)
+
+        weather_agent.assert_called_once()
+        assert response["advice"] == "advice"
+
+
+class TestResponseCache:
+
+    def _invoke_twice(self, first_event, second_event, answers=(_FAKE_AGENT_RESPONSE,)):
+        def answer(_prompt):
+            # Stands in for a successful weather tool call during the agent run
+            agent._request_weather.update({"temperature": 18})
+            return next(replies)
+
+        replies = iter(answers * 2)
+        weather_agent = MagicMock(side_effect=answer)
+        with patch.object(agent, "plant_weather_agent", weather_agent), \
+             patch.object(agent, "user_data_table", user_table(_USER_WITH_PLANTS)):
+            lambda_handler(first_event, None)
+            response = lambda_handler(second_event, None)
+        return response, weather_agent
+
+    def test_repeat_request_is_answered_from_cache(self):
+        response, weather_agent = self._invoke_twice({"user_id": "test_user"}, {"user_id": "test_user"})
+
+        weather_agent.assert_called_once()
+        assert response["advice"] == "advice"
+
+    def test_cache_is_per_user(self):
+        _, weather_agent = self._invoke_twice({"user_id": "test_user"}, {"user_id": "other_user"})
+
+        assert weather_agent.call_count == 2
+
+    def test_free_form_prompts_are_not_cached(self):
+        event = {"prompt": "Which of user_id test_user's plants need water?"}
+        _, weather_agent = self._invoke_twice(event, event)
+
+        assert weather_agent.call_count == 2
+
+    def test_non_advice_answers_are_not_cached(self):
+        answers = ("Sorry, the weather service is unavailable.", _FAKE_AGENT_RESPONSE)
+        _, weather_agent = self._invoke_twice({"user_id": "test_user"}, {"user_id": "test_user"}, answers)
+
+        assert weather_agent.call_count == 2
+
+    def test_answers_without_weather_are_not_cached(self):
+        weather_agent = MagicMock(return_value=_FAKE_AGENT_RESPONSE)
+        with patch.object(agent, "plant_weather_agent", weather_agent), \
+             patch.object(agent, "user_data_table", user_table(_USER_WITH_PLANTS)):
+            lambda_handler({"user_id": "test_user"}, None)
+            lambda_handler({"user_id": "test_user"}, None)
+
+        assert weather_agent.call_count == 2
+
+    def test_cache_window_expires(self):
+        with patch.object(agent.time, "time", side_effect=[0, agent.RESPONSE_CACHE_TTL_SECONDS]):
+            first = agent.response_cache_key("test_user")
+            second = agent.response_cache_key("test_user")
+
+        assert first != second
+
+    def test_key_is_a_fixed_length_digest(self):
+        key = agent.response_cache_key("test_user")
+
+        assert len(key) == 32
+        assert "test_user" not in key
+
+
+class TestWeatherConditionsInResponse:
+
+    def test_weather_conditions_come_from_the_weather_tool(self):
+        def _agent_fetches_weather(prompt):
+            agent._request_weather.update({"temperature": 18.4, "humidity": 61})
+            return {"summary": "Roughly 20°C and 90% humidity today.", "details": {}}
+
+        weather_agent = MagicMock(side_effect=_agent_fetches_weather)
+        with patch.object(agent, "plant_weather_agent", weather_agent), \
+             patch.object(agent, "user_data_table", user_table(_USER_WITH_PLANTS)):
+            response = lambda_handler({"user_id": "test_user"}, None)
+
+        assert response["weather_conditions"] == {"temperature": 18.4, "humidity": 61}
+
+    def test_weather_from_a_previous_request_is_not_reported(self):
+        agent._request_weather.update({"temperature": 30.0})
+        weather_agent = MagicMock(return_value={"summary": "All good.", "details": {}})
+        with patch.object(agent, "plant_weather_agent", weather_agent), \
+             patch.object(agent, "user_data_table", user_table(_USER_WITH_PLANTS)):
+            response = lambda_handler({"user_id": "test_user"}, None)
+
+        assert "weather_conditions" not in response
+
+    def test_cached_response_keeps_its_weather_conditions(self):
+        def _agent_fetches_weather(prompt):
+            agent._request_weather.update({"temperature": 18.4})
+            return _FAKE_AGENT_RESPONSE
+
+        weather_agent = MagicMock(side_effect=_agent_fetches_weather)
+        with patch.object(agent, "plant_weather_agent", weather_agent), \
+             patch.object(agent, "user_data_table", user_table(_USER_WITH_PLANTS)):
+            lambda_handler({"user_id": "test_user"}, None)
+            response = lambda_handler({"user_id": "test_user"}, None)
+
+        weather_agent.assert_called_once()
+        assert response["weather_conditions"] == {"temperature": 18.4}
+
+
+class TestPrefetch:
+
+    def test_plants_and_weather_are_prefetched_for_the_user(self):
+        agent._user_cache.put("test_user", {"latitude": 51.5, "longitude": -0.12, "plants": ["rose"]})
+        with patch.object(agent, "dynamodb_lookup_plants_batch") as mock_plants, \
+             patch.object(agent, "fetch_weather") as mock_weather:
+            futures = _prefetch_user_inputs("test_user")
+            agent.wait(futures)
+
+        mock_plants.assert_called_once_with(["rose"])
+        mock_weather.assert_called_once_with(51.5, -0.12)
+
+    def test_tool_call_during_prefetch_shares_the_running_fetches(self):
+        agent._user_cache.put("test_user", {"latitude": 51.5, "longitude": -0.12, "plants": ["rose"]})
+        agent._plant_cache.clear()
+        agent._weather_cache.clear()
+        started = {"plants": threading.Event(), "weather": threading.Event()}
+        release = threading.Event()
+
+        def slow_batch_get_item(RequestItems):
+            started["plants"].set()
+            release.wait(5)
+            return {"Responses": {agent.PLANT_DEFINITIONS_TABLE_NAME: [{"plant_id": "rose"}]}}
+
+        def slow_open_meteo(latitude, longitude):
+            started["weather"].set()
+            release.wait(5)
+            return {"current": {"temperature_2m": 18}}
+
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = slow_batch_get_item
+        with patch.object(agent, "dynamodb", mock_ddb), \
+             patch.object(agent, "_get_open_meteo", side_effect=slow_open_meteo) as mock_weather:
+            futures = _prefetch_user_inputs("test_user")
+            assert all(event.wait(5) for event in started.values())
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                plants = executor.submit(agent.dynamodb_lookup_user_and_plants, "test_user")
+                weather = executor.submit(agent.fetch_weather, 51.5, -0.12)
+                time.sleep(0.05)
+                release.set()
+                results = plants.result(), weather.result()
+            agent.wait(futures)
+
+        assert mock_ddb.batch_get_item.call_count == 1
+        assert mock_weather.call_count == 1
+        assert [p["plant_id"] for p in results[0]["plants"]] == ["rose"]
+        assert results[1] == {"current": {"temperature_2m": 18}}
+
+    def test_handler_waits_for_prefetches_before_returning(self):
+        prefetch = MagicMock()
+        weather_agent = MagicMock(return_value=_FAKE_AGENT_RESPONSE)
+        with patch.object(agent, "prefetch_user_inputs", return_value=[prefetch]), \
+             patch.object(agent, "wait") as mock_wait, \
+             patch.object(agent, "plant_weather_agent", weather_agent), \
+             patch.object(agent, "user_data_table", user_table(_USER_WITH_PLANTS)):
+            lambda_handler({"user_id": "test_user"}, None)
+
+        mock_wait.assert_called_once_with([prefetch])
+
+
+class TestTimestamp:
+
+    def test_timestamp_is_computed_once_per_invocation(self):
+        weather_agent = MagicMock(return_value=_FAKE_AGENT_RESPONSE)
+        with patch.object(agent, "utc_timestamp", return_value="2025-01-07T10:30:00Z") as mock_now, \
+             patch.object(agent, "plant_weather_agent", weather_agent), \
+             patch.object(agent, "user_data_table", user_table(_USER_WITH_PLANTS)):
+            response = lambda_handler({"user_id": "test_user"}, None)
+
+        mock_now.assert_called_once()
+        assert response["timestamp"] == "2025-01-07T10:30:00Z"
@@ -4,169 +4,159 @@ Integration test for error handling without requiring actual AWS services.
 Tests the Lambda handler with mocked dependencies.
 """
 
-import json
 import sys
 import os
-from unittest.mock import patch, MagicMock
-
-# Add src directory to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
-
-
-def test_api_gateway_validation_errors():
-    """
-    Test API Gateway auth enforcement without AWS dependencies.
-
-    After the Cognito authorizer was wired to the POST /advice endpoint, the
-    Lambda now derives identity exclusively from JWT claims injected by API
-    Gateway — the request body user_id is ignored on the API Gateway path.
-
-    Any API Gateway POST event that reaches the Lambda without valid Cognito
-    authorizer claims is rejected with 401 (missing/invalid claims) before any
-    body validation runs.
-    """
-    print("Testing API Gateway auth enforcement (Cognito claims required)...")
-
-    with patch('boto3.resource'):
-        from agent import lambda_handler
-
-        # Event without Cognito authorizer claims → 401 (auth enforced before body validation)
-        event_no_claims = {
-            'httpMethod': 'POST',
-            'path': '/advice',
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({}),
-            'queryStringParameters': None,
-            'requestContext': {},  # no authorizer claims
-        }
-        response = lambda_handler(event_no_claims, None)
-        response_body = json.loads(response['body'])
-
-        assert response['statusCode'] == 401, (
-            f"Expected 401 for request without Cognito claims, got {response['statusCode']}"
-        )
-        assert 'error' in response_body, "Expected 'error' field in 401 response body"
+
+import pytest
+
+from helpers import body_of, dumps, log
+
+
+# Running this file as a script skips conftest.py, so add src/ to the path here
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Under pytest, conftest.py has already imported agent with boto3 mocked
+from agent import lambda_handler
+
+# API Gateway POST /advice event; tests copy it and set their own body
+_BASE_EVENT = {
+    'httpMethod': 'POST',
+    'path': '/advice',
+    'headers': {'Content-Type': 'application/json'},
+    'body': None,
+    'queryStringParameters': None
+}
+
+
+def _api_gateway_event(**fields):
+    """Copy of the base POST event with the given fields replaced."""
+    event = _BASE_EVENT.copy()
+    event.update(fields)
+    return event
+
+
+# (event, expected_status)
+#
+# After the Cognito authorizer was wired to the POST /advice endpoint, the
+# Lambda derives identity exclusively from JWT claims injected by API
+# Gateway — the request body user_id is ignored on the API Gateway path.
+# Any API Gateway POST event that reaches the Lambda without valid Cognito
+# authorizer claims is rejected with 401 before any body validation runs.
+API_GATEWAY_CASES = [
+    # No Cognito authorizer claims → 401
+    (_api_gateway_event(body=dumps({}), requestContext={}), 401),
+    # Empty sub claim → 401
+    (
+        _api_gateway_event(
+            headers={'Content-Type': 'application/json', 'Authorization': 'tok'},
+            body=dumps({}),
+            requestContext={'authorizer': {'claims': {'sub': '', 'email': 'user@example.com'}}},
+        ),
+        401,
+    ),
+    # OPTIONS preflight still returns 200 (no auth check)
+    (
+        _api_gateway_event(
+            httpMethod='OPTIONS',
+            headers={'Origin': 'https://example.com'},
+            requestContext={},
+        ),
+        200,
+    ),
+]
+
+# (event, expected_summary_contains)
+DIRECT_INVOCATION_CASES = [
+    ({'user_id': 'user@invalid'}, 'invalid characters'),
+    ({}, 'must be provided'),
+]
+
+
+@pytest.mark.parametrize(
+    "event,expected_status", API_GATEWAY_CASES, ids=["missing-claims", "empty-sub", "options-preflight"]
+)
+def test_api_gateway_validation_errors(event, expected_status):
+    """Test API Gateway auth enforcement without AWS dependencies."""
+    response = lambda_handler(event, None)
+
+    assert response['statusCode'] == expected_status, (
+        f"Expected {expected_status}, got {response['statusCode']}"
+    )
+    if expected_status != 200:
+        response_body = body_of(response)
+        assert 'error' in response_body, f"Expected 'error' field in {expected_status} response body"
         assert 'request_id' in response_body, "Missing request_id in response"
-        print("✅ PASS: Request without Cognito claims returns 401")
-
-        # Event with empty sub → 401
-        event_empty_sub = {
-            'httpMethod': 'POST',
-            'path': '/advice',
-            'headers': {'Content-Type': 'application/json', 'Authorization': 'tok'},
-            'body': json.dumps({}),
-            'queryStringParameters': None,
-            'requestContext': {
-                'authorizer': {
-                    'claims': {'sub': '', 'email': 'user@example.com'},
-                },
-            },
-        }
-        response = lambda_handler(event_empty_sub, None)
-        response_body = json.loads(response['body'])
-
-        assert response['statusCode'] == 401, (
-            f"Expected 401 for empty sub claim, got {response['statusCode']}"
-        )
-        print("✅ PASS: Empty sub claim returns 401")
-
-        # OPTIONS preflight still returns 200 (no auth check)
-        event_options = {
-            'httpMethod': 'OPTIONS',
-            'path': '/advice',
-            'headers': {'Origin': 'https://example.com'},
-            'body': None,
-            'queryStringParameters': None,
-            'requestContext': {},
-        }
-        response = lambda_handler(event_options, None)
-        assert response['statusCode'] == 200, (
-            f"Expected 200 for OPTIONS preflight, got {response['statusCode']}"
-        )
-        print("✅ PASS: OPTIONS preflight returns 200 (no auth check)")
-
-
-def test_direct_invocation_validation_errors():
+    log(f"✅ PASS: {event['httpMethod']} returns {expected_status}")
+
+
+@pytest.mark.parametrize(
+    "event,expected_summary", DIRECT_INVOCATION_CASES, ids=["invalid-user-id", "missing-user-id-and-prompt"]
+)
+def test_direct_invocation_validation_errors(event, expected_summary):
     """Test direct invocation validation errors."""
-    print("\nTesting direct invocation validation errors...")
+    response = lambda_handler(event, None)
     
-    with patch('boto3.resource') as mock_boto3:
-        from agent import lambda_handler
-        
-        # Test invalid user_id
-        event = {'user_id': 'user@invalid'}
-        response = lambda_handler(event, None)
-        
-        assert 'invalid characters' in response['summary'].lower(), f"Expected 'invalid characters' in summary: {response['summary']}"
-        assert 'request_id' in response, "Missing request_id in response"
-        print("✅ PASS: Direct invocation with invalid user_id returns error")
-        
-        # Test missing both user_id and prompt
-        event = {}
-        response = lambda_handler(event, None)
-        
-        assert 'must be provided' in response['summary'].lower(), f"Expected 'must be provided' in summary: {response['summary']}"
-        print("✅ PASS: Direct invocation without user_id or prompt returns error")
+    assert expected_summary in response['summary'].lower(), f"Expected '{expected_summary}' in summary: {response['summary']}"
+    assert 'request_id' in response, "Missing request_id in response"
+    log(f"✅ PASS: Direct invocation {event} returns error")
 
 
 def test_cors_headers():
     """Test that CORS headers are included in error responses."""
-    print("\nTesting CORS headers in error responses...")
+    log("\nTesting CORS headers in error responses...")
+    
+    event = _BASE_EVENT.copy()
+    event['body'] = dumps({})
     
-    with patch('boto3.resource') as mock_boto3:
-        from agent import lambda_handler
-        
-        event = {
-            'httpMethod': 'POST',
-            'path': '/advice',
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({})
-        }
-        
-        response = lambda_handler(event, None)
-        
-        required_headers = [
-            'Access-Control-Allow-Origin',
-            'Access-Control-Allow-Headers',
-            'Access-Control-Allow-Methods',
-            'Content-Type'
-        ]
-        
-        for header in required_headers:
-            assert header in response['headers'], f"Missing CORS header: {header}"
-        
-        assert response['headers']['Access-Control-Allow-Origin'] == '*', "CORS origin should be *"
-        print("✅ PASS: CORS headers included in error responses")
+    response = lambda_handler(event, None)
+    
+    required_headers = [
+        'Access-Control-Allow-Origin',
+        'Access-Control-Allow-Headers',
+        'Access-Control-Allow-Methods',
+        'Content-Type'
+    ]
+    
+    missing = set(required_headers).difference(response['headers'])
+    assert not missing, f"Missing CORS headers: {missing}"
+    
+    assert response['headers']['Access-Control-Allow-Origin'] == '*', "CORS origin should be *"
+    log("✅ PASS: CORS headers included in error responses")
 
 
 def test_options_request():
     """Test OPTIONS request handling for CORS preflight."""
-    print("\nTesting OPTIONS request handling...")
+    log("\nTesting OPTIONS request handling...")
     
-    with patch('boto3.resource') as mock_boto3:
-        from agent import lambda_handler
-        
-        event = {
-            'httpMethod': 'OPTIONS',
-            'path': '/advice',
-            'headers': {'Content-Type': 'application/json'},
-            'body': None
-        }
-        
-        response = lambda_handler(event, None)
-        
-        assert response['statusCode'] == 200, f"Expected 200 for OPTIONS, got {response['statusCode']}"
-        assert 'Access-Control-Allow-Origin' in response['headers'], "Missing CORS headers in OPTIONS response"
-        print("✅ PASS: OPTIONS request returns 200 with CORS headers")
+    event = {
+        'httpMethod': 'OPTIONS',
+        'path': '/advice',
+        'headers': {'Content-Type': 'application/json'},
+        'body': None
+    }
+    
+    response = lambda_handler(event, None)
+    
+    assert response['statusCode'] == 200, f"Expected 200 for OPTIONS, got {response['statusCode']}"
+    assert 'Access-Control-Allow-Origin' in response['headers'], "Missing CORS headers in OPTIONS response"
+    log("✅ PASS: OPTIONS request returns 200 with CORS headers")
 
 
 def main():
     """Run all integration tests."""
     print("🧪 Running Error Handling Integration Tests\n")
     
+    def run_cases(test, cases):
+        def run():
+            for case in cases:
+                test(*case)
+        run.__name__ = test.__name__
+        return run
+    
     tests = [
-        test_api_gateway_validation_errors,
-        test_direct_invocation_validation_errors,
+        run_cases(test_api_gateway_validation_errors, API_GATEWAY_CASES),
+        run_cases(test_direct_invocation_validation_errors, DIRECT_INVOCATION_CASES),
         test_cors_headers,
         test_options_request,
     ]
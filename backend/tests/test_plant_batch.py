@@ -0,0 +1,377 @@
+"""
+Tests for the DynamoDB plant lookup tools in agent.py.
+
+Feature: batched plant lookups
+"""
+import threading
+import time
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import agent
+from agent import (
+    dynamodb_lookup_user_data,
+    dynamodb_lookup_plants_batch,
+    dynamodb_lookup_user_and_plants,
+    PLANT_DEFINITIONS_TABLE_NAME,
+)
+from helpers import user_table
+
+
+@pytest.fixture(autouse=True)
+def _empty_caches():
+    """Start every test with cold plant and user caches."""
+    agent._plant_cache.clear()
+    agent._user_cache.clear()
+    agent._user_plant_ids.clear()
+    yield
+    agent._plant_cache.clear()
+    agent._user_cache.clear()
+    agent._user_plant_ids.clear()
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _keys(call):
+    """Return the plant_ids requested by a recorded batch_get_item call."""
+    request_items = call.kwargs["RequestItems"]
+    return [k["plant_id"] for k in request_items[PLANT_DEFINITIONS_TABLE_NAME]["Keys"]]
+
+
+def _response(plant_ids, unprocessed=None):
+    """Build a resource-level batch_get_item response for the given plant_ids."""
+    return {
+        "Responses": {
+            PLANT_DEFINITIONS_TABLE_NAME: [{"plant_id": p, "common_name": p.title()} for p in plant_ids]
+        },
+        "UnprocessedKeys": unprocessed or {},
+    }
+
+
+def _echo_batch_get_item(RequestItems):
+    """batch_get_item side effect that returns every requested key."""
+    return _response([k["plant_id"] for k in RequestItems[PLANT_DEFINITIONS_TABLE_NAME]["Keys"]])
+
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+class TestPlantsBatchLookup:
+
+    def test_single_request_for_small_list(self):
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = _echo_batch_get_item
+        with patch.object(agent, "dynamodb", mock_ddb):
+            result = dynamodb_lookup_plants_batch(["rose", "basil"])
+
+        assert mock_ddb.batch_get_item.call_count == 1
+        assert [p["plant_id"] for p in result["plants"]] == ["rose", "basil"]
+        assert result["not_found"] == []
+
+    def test_chunks_requests_at_100_keys(self):
+        plant_ids = [f"plant_{i}" for i in range(250)]
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = _echo_batch_get_item
+        with patch.object(agent, "dynamodb", mock_ddb):
+            result = dynamodb_lookup_plants_batch(plant_ids)
+
+        sizes = sorted((len(_keys(c)) for c in mock_ddb.batch_get_item.call_args_list), reverse=True)
+        assert sizes == [100, 100, 50]
+        assert len(result["plants"]) == 250
+
+    def test_multiple_chunks_are_fetched_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def _wait_for_all_chunks(RequestItems):
+            # Only passes if all three chunk requests are in flight at the same time
+            barrier.wait()
+            return _echo_batch_get_item(RequestItems)
+
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = _wait_for_all_chunks
+        with patch.object(agent, "dynamodb", mock_ddb):
+            result = dynamodb_lookup_plants_batch([f"plant_{i}" for i in range(250)])
+
+        assert len(result["plants"]) == 250
+        assert result["not_found"] == []
+
+    def test_concurrent_dynamodb_calls_are_capped(self):
+        lock = threading.Lock()
+        in_flight = []
+        peak = []
+
+        def _track(RequestItems):
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.pop()
+            return _echo_batch_get_item(RequestItems)
+
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = _track
+        with patch.object(agent, "dynamodb", mock_ddb), \
+             patch.object(agent, "_ddb_slots", threading.BoundedSemaphore(2)):
+            result = dynamodb_lookup_plants_batch([f"plant_{i}" for i in range(800)])
+
+        assert len(result["plants"]) == 800
+        assert max(peak) <= 2
+
+    def test_requests_only_advice_attributes(self):
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = _echo_batch_get_item
+        with patch.object(agent, "dynamodb", mock_ddb):
+            dynamodb_lookup_plants_batch(["rose"])
+
+        request = mock_ddb.batch_get_item.call_args.kwargs["RequestItems"][PLANT_DEFINITIONS_TABLE_NAME]
+        projected = {
+            request["ExpressionAttributeNames"][placeholder]
+            for placeholder in request["ProjectionExpression"].split(", ")
+        }
+        assert projected == set(agent.PLANT_ADVICE_ATTRIBUTES)
+        assert "plant_id" in projected
+        assert "scientific_name" not in projected
+        assert request["ConsistentRead"] is False
+
+    def test_decimal_attributes_are_converted_to_native_numbers(self):
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.return_value = {
+            "Responses": {
+                PLANT_DEFINITIONS_TABLE_NAME: [
+                    {"plant_id": "rose", "min_temp_c": Decimal("-15"), "ideal_temp_range_c": [Decimal("15.5"), Decimal("26")]}
+                ]
+            }
+        }
+        with patch.object(agent, "dynamodb", mock_ddb):
+            result = dynamodb_lookup_plants_batch(["rose"])
+
+        plant = result["plants"][0]
+        assert plant["min_temp_c"] == -15 and isinstance(plant["min_temp_c"], int)
+        assert plant["ideal_temp_range_c"] == [15.5, 26]
+        assert isinstance(plant["ideal_temp_range_c"][0], float)
+
+    def test_duplicate_ids_are_requested_once(self):
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = _echo_batch_get_item
+        with patch.object(agent, "dynamodb", mock_ddb):
+            dynamodb_lookup_plants_batch(["rose", "rose", "mint"])
+
+        assert _keys(mock_ddb.batch_get_item.call_args) == ["rose", "mint"]
+
+    def test_retries_unprocessed_keys(self):
+        unprocessed = {PLANT_DEFINITIONS_TABLE_NAME: {"Keys": [{"plant_id": "mint"}]}}
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = [
+            _response(["rose"], unprocessed=unprocessed),
+            _response(["mint"]),
+        ]
+        with patch.object(agent, "dynamodb", mock_ddb), patch.object(agent.time, "sleep"):
+            result = dynamodb_lookup_plants_batch(["rose", "mint"])
+
+        assert mock_ddb.batch_get_item.call_count == 2
+        assert mock_ddb.batch_get_item.call_args_list[1].kwargs["RequestItems"] == unprocessed
+        assert {p["plant_id"] for p in result["plants"]} == {"rose", "mint"}
+
+    def test_results_follow_request_order(self):
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.return_value = _response(["mint", "basil", "rose"])
+        with patch.object(agent, "dynamodb", mock_ddb):
+            result = dynamodb_lookup_plants_batch(["rose", "basil", "mint"])
+
+        assert [p["plant_id"] for p in result["plants"]] == ["rose", "basil", "mint"]
+
+    def test_cached_and_fetched_plants_keep_request_order(self):
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = _echo_batch_get_item
+        with patch.object(agent, "dynamodb", mock_ddb):
+            dynamodb_lookup_plants_batch(["mint"])
+            result = dynamodb_lookup_plants_batch(["rose", "mint", "basil"])
+
+        assert [p["plant_id"] for p in result["plants"]] == ["rose", "mint", "basil"]
+
+    def test_missing_plants_reported_as_not_found(self):
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.return_value = _response(["rose"])
+        with patch.object(agent, "dynamodb", mock_ddb):
+            result = dynamodb_lookup_plants_batch(["rose", "unknown_plant"])
+
+        assert result["not_found"] == ["unknown_plant"]
+
+    def test_database_error_returns_error_dict(self):
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = Exception("ThrottlingException")
+        with patch.object(agent, "dynamodb", mock_ddb):
+            result = dynamodb_lookup_plants_batch(["rose"])
+
+        assert "error" in result
+
+
+class TestPlantCache:
+
+    def test_repeat_batch_lookup_served_from_cache(self):
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = _echo_batch_get_item
+        with patch.object(agent, "dynamodb", mock_ddb):
+            dynamodb_lookup_plants_batch(["rose", "basil"])
+            result = dynamodb_lookup_plants_batch(["rose", "basil"])
+
+        assert mock_ddb.batch_get_item.call_count == 1
+        assert {p["plant_id"] for p in result["plants"]} == {"rose", "basil"}
+
+    def test_batch_only_fetches_cache_misses(self):
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = _echo_batch_get_item
+        with patch.object(agent, "dynamodb", mock_ddb):
+            dynamodb_lookup_plants_batch(["rose"])
+            dynamodb_lookup_plants_batch(["rose", "mint"])
+
+        assert _keys(mock_ddb.batch_get_item.call_args) == ["mint"]
+
+    def test_not_found_is_not_cached(self):
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.return_value = _response([])
+        with patch.object(agent, "dynamodb", mock_ddb):
+            dynamodb_lookup_plants_batch(["new_plant"])
+            dynamodb_lookup_plants_batch(["new_plant"])
+
+        assert mock_ddb.batch_get_item.call_count == 2
+
+    def test_expired_entries_are_refetched(self):
+        cache = agent._TTLCache(maxsize=4, ttl=0)
+        cache.put("rose", {"plant_id": "rose"})
+        assert cache.get("rose") is None
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = agent._TTLCache(maxsize=2, ttl=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+
+
+    def test_concurrent_writers_respect_maxsize(self):
+        cache = agent._TTLCache(maxsize=50, ttl=60)
+
+        def _fill(offset):
+            for i in range(500):
+                cache.put(offset + i, i)
+                cache.get(offset + i // 2)
+
+        threads = [threading.Thread(target=_fill, args=(n * 1000,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(cache._data) == 50
+
+
+class TestUserAndPlantsLookup:
+
+    def test_returns_location_and_plant_details_in_one_call(self):
+        users = user_table(
+            {"user_id": "test_user", "latitude": "51.5", "longitude": "-0.12", "plants": ["rose", "mint"]}
+        )
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.side_effect = _echo_batch_get_item
+        with patch.object(agent, "user_data_table", users), patch.object(agent, "dynamodb", mock_ddb):
+            result = dynamodb_lookup_user_and_plants("test_user")
+
+        assert result["latitude"] == 51.5
+        assert result["longitude"] == -0.12
+        assert {p["plant_id"] for p in result["plants"]} == {"rose", "mint"}
+        assert mock_ddb.batch_get_item.call_count == 1
+
+    def test_user_without_plants_skips_plant_lookup(self):
+        users = user_table({"user_id": "test_user", "latitude": "1", "longitude": "2", "plants": []})
+        mock_ddb = MagicMock()
+        with patch.object(agent, "user_data_table", users), patch.object(agent, "dynamodb", mock_ddb):
+            result = dynamodb_lookup_user_and_plants("test_user")
+
+        assert result["plants"] == []
+        mock_ddb.batch_get_item.assert_not_called()
+
+    def test_incomplete_location_returns_error(self):
+        users = user_table({"user_id": "test_user", "plants": ["rose"]})
+        with patch.object(agent, "user_data_table", users):
+            result = dynamodb_lookup_user_and_plants("test_user")
+
+        assert "error" in result
+
+    def test_repeat_user_lookup_served_from_cache(self):
+        users = user_table({"user_id": "test_user", "latitude": "1", "longitude": "2", "plants": ["rose"]})
+        with patch.object(agent, "user_data_table", users):
+            first = dynamodb_lookup_user_data("test_user")
+            second = dynamodb_lookup_user_data("test_user")
+
+        assert users.get_item.call_count == 1
+        assert second == first == {"latitude": 1.0, "longitude": 2.0, "plants": ["rose"]}
+
+    def test_known_plants_are_read_with_the_user_item(self):
+        agent._user_plant_ids.put("test_user", ["rose", "mint"])
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.return_value = {
+            "Responses": {
+                agent.USER_DATA_TABLE_NAME: [
+                    {"user_id": "test_user", "latitude": "51.5", "longitude": "-0.12", "plants": ["rose", "mint"]}
+                ],
+                PLANT_DEFINITIONS_TABLE_NAME: [{"plant_id": "rose"}, {"plant_id": "mint"}],
+            }
+        }
+        users = user_table(None)
+        with patch.object(agent, "user_data_table", users), patch.object(agent, "dynamodb", mock_ddb):
+            result = dynamodb_lookup_user_and_plants("test_user")
+
+        users.get_item.assert_not_called()
+        assert mock_ddb.batch_get_item.call_count == 1
+        request_items = mock_ddb.batch_get_item.call_args.kwargs["RequestItems"]
+        assert set(request_items) == {agent.USER_DATA_TABLE_NAME, PLANT_DEFINITIONS_TABLE_NAME}
+        assert [p["plant_id"] for p in result["plants"]] == ["rose", "mint"]
+
+    def test_repeated_known_plant_ids_are_requested_once(self):
+        agent._user_plant_ids.put("test_user", ["rose", "rose", "basil"])
+        mock_ddb = MagicMock()
+        mock_ddb.batch_get_item.return_value = {
+            "Responses": {
+                agent.USER_DATA_TABLE_NAME: [
+                    {"user_id": "test_user", "latitude": "1", "longitude": "2", "plants": ["rose", "rose", "basil"]}
+                ],
+                PLANT_DEFINITIONS_TABLE_NAME: [{"plant_id": "rose"}, {"plant_id": "basil"}],
+            }
+        }
+        with patch.object(agent, "dynamodb", mock_ddb):
+            agent._get_user_item("test_user")
+
+        assert _keys(mock_ddb.batch_get_item.call_args) == ["rose", "basil"]
+
+    def test_first_lookup_remembers_plant_ids(self):
+        users = user_table({"user_id": "test_user", "latitude": "1", "longitude": "2", "plants": ["rose"]})
+        with patch.object(agent, "user_data_table", users):
+            dynamodb_lookup_user_data("test_user")
+
+        assert agent._user_plant_ids.get("test_user") == ["rose"]
+
+    def test_cached_known_plants_use_plain_get_item(self):
+        agent._user_plant_ids.put("test_user", ["rose"])
+        agent._plant_cache.put("rose", {"plant_id": "rose"})
+        users = user_table({"user_id": "test_user", "latitude": "1", "longitude": "2", "plants": ["rose"]})
+        mock_ddb = MagicMock()
+        with patch.object(agent, "user_data_table", users), patch.object(agent, "dynamodb", mock_ddb):
+            dynamodb_lookup_user_and_plants("test_user")
+
+        users.get_item.assert_called_once()
+        mock_ddb.batch_get_item.assert_not_called()
+
+    def test_unknown_user_raises(self):
+        users = user_table(None)
+        with patch.object(agent, "user_data_table", users):
+            with pytest.raises(ValueError):
+                dynamodb_lookup_user_and_plants("ghost")
@@ -4,12 +4,17 @@ Test script to verify that automatic prompt construction from user_id works corr
 This tests the core functionality of task 2.
 """
 
-import json
 import sys
 import os
 
-# Add src directory to path so we can import the agent
-sys.path.insert(0, 'src')
+import pytest
+
+from helpers import dumps, log
+
+
+# Running this file as a script skips conftest.py, so add src/ to the path here
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 def test_api_gateway_prompt_construction():
     """Test that API Gateway events with user_id construct the correct prompt"""
@@ -20,7 +25,7 @@ def test_api_gateway_prompt_construction():
         'httpMethod': 'POST',
         'path': '/advice',
         'headers': {'Content-Type': 'application/json'},
-        'body': json.dumps({'user_id': 'testuser123'}),
+        'body': dumps({'user_id': 'testuser123'}),
         'queryStringParameters': None
     }
     
@@ -37,9 +42,16 @@ def test_api_gateway_prompt_construction():
     
     assert constructed_prompt == expected_prompt, f"Prompt construction failed. Expected: '{expected_prompt}', Got: '{constructed_prompt}'"
     
-    print("✓ API Gateway prompt construction test passed")
-    print(f"  User ID: {user_id}")
-    print(f"  Constructed prompt: {constructed_prompt}")
+    log("✓ API Gateway prompt construction test passed")
+    log(f"  User ID: {user_id}")
+    log(f"  Constructed prompt: {constructed_prompt}")
+
+def test_invalid_json_body_raises_value_error():
+    """Test that a malformed API Gateway body is reported as a ValueError"""
+    from agent import parse_api_gateway_request
+    
+    with pytest.raises(ValueError, match="Invalid JSON"):
+        parse_api_gateway_request({'httpMethod': 'POST', 'path': '/advice', 'headers': {}, 'body': '{"user_id": '})
 
 def test_direct_invocation_prompt_construction():
     """Test that direct Lambda invocation with user_id constructs the correct prompt"""
@@ -57,9 +69,9 @@ def test_direct_invocation_prompt_construction():
     
     assert constructed_prompt == expected_prompt, f"Prompt construction failed. Expected: '{expected_prompt}', Got: '{constructed_prompt}'"
     
-    print("✓ Direct invocation prompt construction test passed")
-    print(f"  User ID: {user_id}")
-    print(f"  Constructed prompt: {constructed_prompt}")
+    log("✓ Direct invocation prompt construction test passed")
+    log(f"  User ID: {user_id}")
+    log(f"  Constructed prompt: {constructed_prompt}")
 
 def test_prompt_triggers_lookup_tool():
     """Test that the constructed prompt would trigger the dynamodb_lookup_user_data tool"""
@@ -71,10 +83,10 @@ def test_prompt_triggers_lookup_tool():
     assert user_id in constructed_prompt, "Prompt should contain the user_id"
     assert "user_id" in constructed_prompt, "Prompt should mention user_id to trigger lookup"
     
-    print("✓ Prompt content verification test passed")
-    print(f"  Prompt contains user_id: {user_id in constructed_prompt}")
-    print(f"  Prompt mentions user_id: {'user_id' in constructed_prompt}")
-    print(f"  Full prompt: {constructed_prompt}")
+    log("✓ Prompt content verification test passed")
+    log(f"  Prompt contains user_id: {user_id in constructed_prompt}")
+    log(f"  Prompt mentions user_id: {'user_id' in constructed_prompt}")
+    log(f"  Full prompt: {constructed_prompt}")
 
 if __name__ == "__main__":
     print("Testing automatic prompt construction from user_id...")
@@ -3,6 +3,9 @@
 Simple test to verify prompt construction logic without external dependencies.
 """
 
+from helpers import log
+
+
 def test_prompt_construction():
     """Test the prompt construction logic"""
     
@@ -14,8 +17,8 @@ def test_prompt_construction():
         "guest"
     ]
     
-    print("Testing prompt construction from user_id...")
-    print("=" * 50)
+    log("Testing prompt construction from user_id...")
+    log("=" * 50)
     
     for user_id in test_cases:
         # This is the exact logic from the agent
@@ -25,16 +28,16 @@ def test_prompt_construction():
         assert "Give me plant advice for user_id" in constructed_prompt
         assert user_id in constructed_prompt
         
-        print(f"✓ User ID: {user_id}")
-        print(f"  Constructed prompt: {constructed_prompt}")
-        print()
+        log(f"✓ User ID: {user_id}")
+        log(f"  Constructed prompt: {constructed_prompt}")
+        log()
     
-    print("=" * 50)
-    print("✓ All prompt construction tests passed!")
-    print("\nTask 2 implementation verified:")
-    print("- ✓ Standard prompt construction from user_id")
-    print("- ✓ Prompt format matches requirement: 'Give me plant advice for user_id {user_id}'")
-    print("- ✓ System prompt will trigger dynamodb_lookup_user_data tool when it sees user_id pattern")
+    log("=" * 50)
+    log("✓ All prompt construction tests passed!")
+    log("\nTask 2 implementation verified:")
+    log("- ✓ Standard prompt construction from user_id")
+    log("- ✓ Prompt format matches requirement: 'Give me plant advice for user_id {user_id}'")
+    log("- ✓ System prompt will trigger dynamodb_lookup_user_data tool when it sees user_id pattern")
 
 if __name__ == "__main__":
     test_prompt_construction()
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""
+Unit tests for the response formatting, validation and error-mapping helpers in response_utils.py.
+"""
+import uuid
+from unittest.mock import patch
+
+import pytest
+
+import response_utils
+
+
+class TestWeatherTextFallback:
+
+    @pytest.mark.parametrize("text,humidity", [
+        ("Expect 90% humidity today.", 90),
+        ("Humidity of 85% will help the ferns.", 85),
+        ("Roughly 20 °C with humidity near 100 %.", 100),
+    ])
+    def test_humidity_is_read_from_the_advice_text(self, text, humidity):
+        conditions = response_utils.extract_weather_conditions_from_response({"summary": text, "details": {}})
+
+        assert conditions["humidity"] == humidity
+
+    def test_all_values_are_read_in_one_pass(self):
+        text = "Expect 90% humidity, around 18°C and partly cloudy skies, sunny later."
+
+        conditions = response_utils.extract_weather_conditions_from_response({"summary": text, "details": {}})
+
+        assert conditions == {"humidity": 90, "temperature": 18, "condition": "partly cloudy"}
+
+    def test_distant_percentages_are_not_read_as_humidity(self):
+        text = "Humidity " + "x" * 100 + " 40% of the leaves are yellow."
+
+        conditions = response_utils.extract_weather_conditions_from_response({"summary": text, "details": {}})
+
+        assert "humidity" not in (conditions or {})
+
+    def test_detail_keys_are_not_searched(self):
+        response = {"summary": "Good week ahead.", "details": {"bed_3": "Sunny and 18°C."}}
+
+        conditions = response_utils.extract_weather_conditions_from_response(response)
+
+        assert conditions == {"temperature": 18, "condition": "sunny"}
+
+
+class TestTimestamp:
+
+    def test_timestamp_has_fixed_millisecond_precision(self):
+        fixed = response_utils.datetime(2025, 1, 7, 10, 30, tzinfo=response_utils.timezone.utc)
+        with patch.object(response_utils, "datetime") as mock_datetime:
+            mock_datetime.now.return_value = fixed
+            assert response_utils.utc_timestamp() == "2025-01-07T10:30:00.000Z"
+
+    def test_api_gateway_response_uses_the_given_timestamp(self):
+        response = response_utils.create_api_gateway_response(200, {}, timestamp="2025-01-07T10:30:00Z")
+
+        assert response_utils.json_loads(response["body"])["timestamp"] == "2025-01-07T10:30:00Z"
+
+
+class TestRequestId:
+
+    def test_error_body_fallback_uses_the_handler_format(self):
+        body = response_utils.json_loads(response_utils.create_api_gateway_response(500, error_message="boom")["body"])
+
+        assert str(uuid.UUID(body["request_id"])) == body["request_id"]
+
+
+class TestDirectResponse:
+
+    def test_success_response_maps_summary_to_advice(self):
+        response = response_utils.create_direct_response(
+            200, {"summary": "Water the roses.", "details": {"rose": "water"}},
+            user_id="test_user", request_id="req-1", timestamp="2025-01-07T10:30:00Z",
+        )
+
+        assert response == {
+            "advice": "Water the roses.",
+            "details": {"rose": "water"},
+            "timestamp": "2025-01-07T10:30:00Z",
+            "request_id": "req-1",
+            "user_id": "test_user",
+        }
+
+    def test_error_response_reports_message_as_summary(self):
+        response = response_utils.create_direct_response(500, error_message="Service down", user_id="test_user")
+
+        assert response["summary"] == "Service down"
+        assert response["details"] == {}
+        assert response["user_id"] == "test_user"
+
+    def test_error_response_omits_missing_user_id(self):
+        response = response_utils.create_direct_response(400, error_message="Either 'user_id' or 'prompt' must be provided")
+
+        assert "user_id" not in response
+
+
+class TestJsonFallback:
+
+    @pytest.mark.parametrize("value", [{"advice": "Water the Rosé", "details": {"rose": "ok"}}, [1, 2.5, None]])
+    def test_stdlib_fallback_matches_orjson_output(self, value):
+        expected = response_utils.json_dumps(value)
+        with patch.object(response_utils, "orjson", None):
+            assert response_utils.json_dumps(value) == expected
+
+
+class TestErrorRules:
+
+    def test_database_rules_match_mixed_case_payload(self):
+        error = Exception("An error occurred (ResourceNotFoundException) when calling the GetItem operation")
+        assert response_utils.handle_database_error(error, "u1") == (
+            404, "User not found: No user profile found for user_id: u1"
+        )
+
+    def test_database_rule_priority_beats_position(self):
+        error = Exception("ValidationException raised while reporting: No user data found")
+        assert response_utils.handle_database_error(error, "u1")[0] == 404
+
+    def test_bedrock_rules(self):
+        assert response_utils.handle_ai_service_error(Exception("Bedrock ThrottlingException"))[0] == 503
+        assert response_utils.handle_ai_service_error(Exception("NOVA AccessDenied"))[0] == 500
@@ -3,209 +3,97 @@
 Test script for user_id validation logic without AWS dependencies.
 """
 
-import re
-from typing import Any
+import os
+import sys
 
+import pytest
 
-def validate_user_id(user_id: Any) -> tuple[bool, str]:
-    """
-    Validate user_id format and content.
-    
-    Args:
-        user_id: The user_id value to validate
-        
-    Returns:
-        tuple: (is_valid: bool, error_message: str)
-    """
-    if user_id is None:
-        return False, "'user_id' field is required in the request body."
-    
-    if not isinstance(user_id, str):
-        return False, "'user_id' must be a string."
-    
-    if not user_id.strip():
-        return False, "'user_id' cannot be empty or contain only whitespace."
-    
-    # Check for basic format requirements (alphanumeric, underscore, hyphen allowed)
-    if not re.match(r'^[a-zA-Z0-9_-]+$', user_id.strip()):
-        return False, "'user_id' contains invalid characters. Only letters, numbers, underscores, and hyphens are allowed."
-    
-    # Check length constraints
-    if len(user_id.strip()) < 1:
-        return False, "'user_id' must be at least 1 character long."
-    
-    if len(user_id.strip()) > 50:
-        return False, "'user_id' must be 50 characters or less."
-    
-    return True, ""
+from helpers import log
 
 
-def handle_database_error(error: Exception, user_id: str = None) -> tuple[int, str]:
-    """
-    Handle database-related errors and return appropriate status code and message.
-    
-    Args:
-        error: The exception that occurred
-        user_id: The user_id that was being processed
-        
-    Returns:
-        tuple: (status_code: int, error_message: str)
-    """
-    error_str = str(error).lower()
-    
-    # Check for user not found errors
-    if "no user data found" in error_str or "no user item found" in error_str:
-        return 404, f"User not found: No user profile found for user_id: {user_id}"
-    
-    # Check for DynamoDB specific errors
-    if "resourcenotfoundexception" in error_str:
-        return 404, f"User not found: No user profile found for user_id: {user_id}"
-    
-    if "accessdeniedexception" in error_str or "unauthorizedoperation" in error_str:
-        return 500, "Database access error. Please contact support."
-    
-    if "throttlingexception" in error_str or "provisionedthroughputexceeded" in error_str:
-        return 503, "Service temporarily unavailable due to high demand. Please try again later."
-    
-    if "validationexception" in error_str:
-        return 400, f"Invalid user_id format: {user_id}"
-    
-    # Generic database error
-    return 500, "A database error occurred while processing your request."
+# Running this file as a script skips conftest.py, so add src/ to the path here
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
+# response_utils has no AWS or Strands imports, so these run without the agent module
+from response_utils import validate_user_id, handle_database_error, handle_ai_service_error
 
-def handle_ai_service_error(error: Exception) -> tuple[int, str]:
-    """
-    Handle AI service (Bedrock) related errors and return appropriate status code and message.
-    
-    Args:
-        error: The exception that occurred
-        
-    Returns:
-        tuple: (status_code: int, error_message: str)
-    """
-    error_str = str(error).lower()
-    
-    # Check for Bedrock specific errors
-    if "bedrock" in error_str or "nova" in error_str:
-        if "throttling" in error_str or "rate" in error_str:
-            return 503, "AI service temporarily unavailable due to high demand. Please try again later."
-        elif "access" in error_str or "unauthorized" in error_str:
-            return 500, "AI service access error. Please contact support."
-        else:
-            return 503, "AI service temporarily unavailable. Please try again later."
-    
-    # Check for weather service errors
-    if "weather" in error_str or "open-meteo" in error_str or "http_request" in error_str:
-        return 503, "Weather service temporarily unavailable. Please try again later."
-    
-    # Generic service error
-    return 503, "External service temporarily unavailable. Please try again later."
 
+USER_ID_CASES = [
+    # (input, expected_valid, expected_error_contains)
+    (None, False, "required"),
+    ("", False, "empty"),
+    ("   ", False, "whitespace"),
+    (123, False, "string"),
+    ("valid_user", True, ""),
+    ("user-123", True, ""),
+    ("user@invalid", False, "invalid characters"),
+    ("a" * 51, False, "50 characters"),
+    ("user with spaces", False, "invalid characters"),
+    ("user123", True, ""),
+    ("test_user", True, ""),
+    ("test-user-123", True, ""),
+    ("123user", True, ""),
+    ("user$invalid", False, "invalid characters"),
+    ("user.invalid", False, "invalid characters"),
+]
 
-def test_user_id_validation():
+# (error, user_id, expected_status, expected_message_contains)
+DATABASE_ERROR_CASES = [
+    (ValueError("No user data found for user ID 'testuser'"), "testuser", 404, "user not found"),
+    (Exception("ResourceNotFoundException"), "testuser", 404, "user not found"),
+    (Exception("AccessDeniedException"), "testuser", 500, "access error"),
+    (Exception("ThrottlingException"), "testuser", 503, "temporarily unavailable"),
+    (Exception("ValidationException"), "testuser", 400, "invalid user_id"),
+    (Exception("Generic database error"), "testuser", 500, "database error"),
+]
+
+# (error, expected_status, expected_message_contains)
+AI_SERVICE_ERROR_CASES = [
+    (Exception("Bedrock service unavailable"), 503, "service"),
+    (Exception("Nova model throttling"), 503, "temporarily unavailable"),
+    (Exception("Bedrock access denied"), 500, "access error"),
+    (Exception("Weather API error"), 503, "weather service"),
+    (Exception("http_request failed"), 503, "service"),
+    (Exception("Generic service error"), 503, "service"),
+]
+
+
+@pytest.mark.parametrize("user_id,expected_valid,expected_error_contains", USER_ID_CASES)
+def test_user_id_validation(user_id, expected_valid, expected_error_contains):
     """Test user_id validation function with various inputs."""
-    print("Testing user_id validation...")
-    
-    test_cases = [
-        # (input, expected_valid, expected_error_contains)
-        (None, False, "required"),
-        ("", False, "empty"),
-        ("   ", False, "whitespace"),
-        (123, False, "string"),
-        ("valid_user", True, ""),
-        ("user-123", True, ""),
-        ("user@invalid", False, "invalid characters"),
-        ("a" * 51, False, "50 characters"),
-        ("user with spaces", False, "invalid characters"),
-        ("user123", True, ""),
-        ("test_user", True, ""),
-        ("test-user-123", True, ""),
-        ("123user", True, ""),
-        ("user$invalid", False, "invalid characters"),
-        ("user.invalid", False, "invalid characters"),
-    ]
-    
-    passed = 0
-    total = len(test_cases)
-    
-    for user_id, expected_valid, expected_error_contains in test_cases:
-        is_valid, error_message = validate_user_id(user_id)
-        
-        if is_valid != expected_valid:
-            print(f"❌ FAIL: user_id={user_id}, expected valid={expected_valid}, got valid={is_valid}")
-            continue
-        
-        if not expected_valid and expected_error_contains not in error_message.lower():
-            print(f"❌ FAIL: user_id={user_id}, expected error to contain '{expected_error_contains}', got '{error_message}'")
-            continue
-        
-        print(f"✅ PASS: user_id={user_id} -> valid={is_valid}")
-        passed += 1
-    
-    print(f"User ID validation: {passed}/{total} tests passed\n")
-    return passed == total
+    is_valid, error_message = validate_user_id(user_id)
+    
+    assert is_valid == expected_valid, f"user_id={user_id!r}: expected valid={expected_valid}, got valid={is_valid}"
+    if not expected_valid:
+        assert expected_error_contains in error_message.lower(), (
+            f"user_id={user_id!r}: expected error to contain '{expected_error_contains}', got '{error_message}'"
+        )
+    log(f"✅ PASS: user_id={user_id} -> valid={is_valid}")
 
 
-def test_error_handler_functions():
-    """Test the error handler utility functions."""
-    print("Testing error handler functions...")
-    
-    passed = 0
-    total = 0
-    
-    # Test database error handling
-    test_cases = [
-        (ValueError("No user data found for user ID 'testuser'"), "testuser", 404, "user not found"),
-        (Exception("ResourceNotFoundException"), "testuser", 404, "user not found"),
-        (Exception("AccessDeniedException"), "testuser", 500, "access error"),
-        (Exception("ThrottlingException"), "testuser", 503, "temporarily unavailable"),
-        (Exception("ValidationException"), "testuser", 400, "invalid user_id"),
-        (Exception("Generic database error"), "testuser", 500, "database error"),
-    ]
-    
-    for error, user_id, expected_status, expected_message_contains in test_cases:
-        total += 1
-        status_code, message = handle_database_error(error, user_id)
-        
-        if status_code != expected_status:
-            print(f"❌ FAIL: Expected {expected_status} for {error}, got {status_code}")
-            continue
-        
-        if expected_message_contains not in message.lower():
-            print(f"❌ FAIL: Expected '{expected_message_contains}' in message, got '{message}'")
-            continue
-        
-        print(f"✅ PASS: Database error {type(error).__name__} -> {status_code}")
-        passed += 1
-    
-    # Test AI service error handling
-    ai_test_cases = [
-        (Exception("Bedrock service unavailable"), 503, "service"),
-        (Exception("Nova model throttling"), 503, "temporarily unavailable"),
-        (Exception("Bedrock access denied"), 500, "access error"),
-        (Exception("Weather API error"), 503, "weather service"),
-        (Exception("http_request failed"), 503, "service"),
-        (Exception("Generic service error"), 503, "service"),
-    ]
-    
-    for error, expected_status, expected_message_contains in ai_test_cases:
-        total += 1
-        status_code, message = handle_ai_service_error(error)
-        
-        if status_code != expected_status:
-            print(f"❌ FAIL: Expected {expected_status} for {error}, got {status_code}")
-            continue
-        
-        if expected_message_contains not in message.lower():
-            print(f"❌ FAIL: Expected '{expected_message_contains}' in message, got '{message}'")
-            continue
-        
-        print(f"✅ PASS: AI service error -> {status_code}")
-        passed += 1
-    
-    print(f"Error handler functions: {passed}/{total} tests passed\n")
-    return passed == total
+@pytest.mark.parametrize("error,user_id,expected_status,expected_message_contains", DATABASE_ERROR_CASES)
+def test_database_error_handler(error, user_id, expected_status, expected_message_contains):
+    """Test database errors map to the right status code and message."""
+    status_code, message = handle_database_error(error, user_id)
+    
+    assert status_code == expected_status, f"Expected {expected_status} for {error}, got {status_code}"
+    assert expected_message_contains in message.lower(), (
+        f"Expected '{expected_message_contains}' in message, got '{message}'"
+    )
+    log(f"✅ PASS: Database error {type(error).__name__} -> {status_code}")
+
+
+@pytest.mark.parametrize("error,expected_status,expected_message_contains", AI_SERVICE_ERROR_CASES)
+def test_ai_service_error_handler(error, expected_status, expected_message_contains):
+    """Test AI and weather service errors map to the right status code and message."""
+    status_code, message = handle_ai_service_error(error)
+    
+    assert status_code == expected_status, f"Expected {expected_status} for {error}, got {status_code}"
+    assert expected_message_contains in message.lower(), (
+        f"Expected '{expected_message_contains}' in message, got '{message}'"
+    )
+    log(f"✅ PASS: AI service error -> {status_code}")
 
 
 def main():
@@ -213,19 +101,20 @@ def main():
     print("🧪 Running Enhanced Error Handling Validation Tests\n")
     
     tests = [
-        test_user_id_validation,
-        test_error_handler_functions,
+        (test_user_id_validation, USER_ID_CASES),
+        (test_database_error_handler, DATABASE_ERROR_CASES),
+        (test_ai_service_error_handler, AI_SERVICE_ERROR_CASES),
     ]
     
     all_passed = True
     
-    for test in tests:
-        try:
-            if not test():
+    for test, cases in tests:
+        for case in cases:
+            try:
+                test(*case)
+            except Exception as e:
+                print(f"❌ Test {test.__name__} failed for {case}: {e}")
                 all_passed = False
-        except Exception as e:
-            print(f"❌ Test {test.__name__} failed with exception: {e}")
-            all_passed = False
     
     if all_passed:
         print("🎉 All validation tests passed!")
@@ -242,6 +131,5 @@ def main():
 
 
 if __name__ == "__main__":
-    import sys
     success = main()
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""
+Tests for the Open-Meteo weather tools in agent.py.
+
+Feature: weather lookups
+"""
+import threading
+from urllib.parse import urlsplit, parse_qs
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import agent
+from agent import fetch_weather, fetch_weather_batch, fetch_weather_and_plants, weather_conditions_from_forecast
+
+
+@pytest.fixture(autouse=True)
+def _empty_weather_cache():
+    """Start every test with a cold weather cache and no recorded request weather."""
+    agent._weather_cache.clear()
+    agent._request_weather.clear()
+    yield
+    agent._weather_cache.clear()
+    agent._request_weather.clear()
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _forecast(lat, lon, temperature=18.0):
+    """Minimal Open-Meteo forecast object for one location."""
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "current": {"temperature_2m": temperature, "relative_humidity_2m": 60, "wind_speed_10m": 12.0},
+    }
+
+
+def _query(call):
+    """Return the query parameters of a recorded session.get call."""
+    return {k: v[0] for k, v in parse_qs(urlsplit(call.args[0]).query).items()}
+
+
+def _http_response(payload):
+    response = MagicMock()
+    response.json.return_value = payload
+    return response
+
+
+# ---------------------------------------------------------------------------
+# Unit tests
+# ---------------------------------------------------------------------------
+
+class TestFetchWeather:
+
+    def test_requests_forecast_for_location(self):
+        payload = _forecast(52.52, 13.41)
+        with patch.object(agent.http_session, "get", return_value=_http_response(payload)) as mock_get:
+            result = fetch_weather(52.52, 13.41)
+
+        params = _query(mock_get.call_args)
+        assert params["latitude"] == "52.52"
+        assert params["longitude"] == "13.41"
+        assert params["hourly"] == agent.OPEN_METEO_PARAMS["hourly"]
+        assert result == payload
+        assert mock_get.call_args.kwargs["timeout"] == (3.0, 10.0)
+
+    def test_nearby_repeat_request_served_from_cache(self):
+        payload = _forecast(52.52, 13.41)
+        with patch.object(agent.http_session, "get", return_value=_http_response(payload)) as mock_get:
+            fetch_weather(52.5201, 13.4099)
+            result = fetch_weather(52.52, 13.41)
+
+        assert mock_get.call_count == 1
+        assert result == payload
+
+    def test_expired_forecast_is_refetched(self):
+        with patch.object(agent.http_session, "get", return_value=_http_response(_forecast(52.52, 13.41))) as mock_get, \
+                patch.object(agent._weather_cache, "ttl", 0):
+            fetch_weather(52.52, 13.41)
+            fetch_weather(52.52, 13.41)
+
+        assert mock_get.call_count == 2
+
+    def test_failure_is_not_cached(self):
+        with patch.object(agent.http_session, "get", side_effect=Exception("timeout")) as mock_get:
+            first = fetch_weather(52.52, 13.41)
+            fetch_weather(52.52, 13.41)
+
+        assert "error" in first
+        assert mock_get.call_count == 2
+
+
+class TestHttpSession:
+
+    def test_open_meteo_requests_share_a_retrying_connection_pool(self):
+        adapter = agent.http_session.get_adapter(agent.OPEN_METEO_URL)
+        assert adapter._pool_maxsize == 20
+        assert adapter.max_retries.total == 3
+        assert 503 in adapter.max_retries.status_forcelist
+
+
+class TestFetchWeatherBatch:
+
+    def test_single_request_for_all_locations(self):
+        payload = [_forecast(52.52, 13.41), _forecast(48.85, 2.35)]
+        with patch.object(agent.http_session, "get", return_value=_http_response(payload)) as mock_get:
+            result = fetch_weather_batch([[52.52, 13.41], [48.85, 2.35]])
+
+        assert mock_get.call_count == 1
+        params = _query(mock_get.call_args)
+        assert params["latitude"] == "52.52,48.85"
+        assert params["longitude"] == "13.41,2.35"
+        assert params["current"] == agent.OPEN_METEO_PARAMS["current"]
+        assert result["forecasts"] == payload
+
+    def test_single_location_object_is_wrapped_in_list(self):
+        payload = _forecast(52.52, 13.41)
+        with patch.object(agent.http_session, "get", return_value=_http_response(payload)):
+            result = fetch_weather_batch([[52.52, 13.41]])
+
+        assert result["forecasts"] == [payload]
+
+    def test_http_failure_returns_error_dict(self):
+        with patch.object(agent.http_session, "get", side_effect=Exception("connection reset")):
+            result = fetch_weather_batch([[52.52, 13.41]])
+
+        assert "error" in result
+
+
+class TestFetchWeatherAndPlants:
+
+    def test_returns_weather_and_plants_together(self):
+        payload = _forecast(52.52, 13.41)
+        plant_data = {"plants": [{"plant_id": "rose"}], "not_found": ["fern"]}
+        with patch.object(agent.http_session, "get", return_value=_http_response(payload)), \
+             patch.object(agent, "dynamodb_lookup_plants_batch", return_value=plant_data) as mock_plants:
+            result = fetch_weather_and_plants(52.52, 13.41, ["rose", "fern"])
+
+        mock_plants.assert_called_once_with(["rose", "fern"])
+        assert result == {"weather": payload, **plant_data}
+
+    def test_lookups_run_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def _weather(*args, **kwargs):
+            barrier.wait()
+            return _http_response(_forecast(52.52, 13.41))
+
+        def _plants(plant_ids):
+            barrier.wait()
+            return {"plants": [], "not_found": plant_ids}
+
+        with patch.object(agent.http_session, "get", side_effect=_weather), \
+             patch.object(agent, "dynamodb_lookup_plants_batch", side_effect=_plants):
+            result = fetch_weather_and_plants(52.52, 13.41, ["rose"])
+
+        assert "error" not in result
+
+    def test_weather_failure_returns_error_dict(self):
+        with patch.object(agent.http_session, "get", side_effect=Exception("timeout")), \
+             patch.object(agent, "dynamodb_lookup_plants_batch", return_value={"plants": [], "not_found": []}):
+            result = fetch_weather_and_plants(52.52, 13.41, ["rose"])
+
+        assert "error" in result
+
+
+class TestWeatherConditions:
+
+    def test_conditions_use_exact_current_values(self):
+        forecast = _forecast(52.52, 13.41, temperature=18.4)
+        forecast["current"]["weather_code"] = 2
+
+        assert weather_conditions_from_forecast(forecast) == {
+            "temperature": 18.4,
+            "humidity": 60,
+            "wind_speed": 12.0,
+            "condition": "partly cloudy",
+        }
+
+    def test_forecast_without_current_block_has_no_conditions(self):
+        assert weather_conditions_from_forecast({"hourly": {}}) is None
+
+    def test_fetch_weather_records_first_location_for_the_request(self):
+        with patch.object(agent.http_session, "get", return_value=_http_response(_forecast(52.52, 13.41, 18.0))):
+            fetch_weather(52.52, 13.41)
+        with patch.object(agent.http_session, "get", return_value=_http_response(_forecast(48.85, 2.35, 25.0))):
+            fetch_weather(48.85, 2.35)
+
+        assert agent._request_weather["temperature"] == 18.0
+
+    def test_cached_forecast_is_recorded_too(self):
+        with patch.object(agent.http_session, "get", return_value=_http_response(_forecast(52.52, 13.41, 18.0))):
+            fetch_weather(52.52, 13.41)
+        agent._request_weather.clear()
+        fetch_weather(52.52, 13.41)
+
+        assert agent._request_weather["temperature"] == 18.0